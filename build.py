@@ -0,0 +1,69 @@
+# ============================================
+# СБОРКА ШАХМАТНОГО АНАЛИЗАТОРА ДЛЯ РАСПРОСТРАНЕНИЯ
+# Для режима nuitka требуется: pip install nuitka
+# ============================================
+
+import os
+import py_compile
+import subprocess
+import sys
+
+# Собираемый скрипт и папка с результатом
+MAIN_SCRIPT = "chess_analyzer.py"
+OUTPUT_DIR = "dist"
+
+# Скрипты, распространяемые в виде байт-кода
+BYTECODE_SCRIPTS = ("chess_analyzer.py", "check.py")
+BYTECODE_DIR = os.path.join(OUTPUT_DIR, "bytecode")
+
+
+def build_nuitka():
+    """Компиляция анализатора в самостоятельную программу через Nuitka"""
+    command = [
+        sys.executable, "-m", "nuitka",
+        "--standalone",
+        "--enable-plugin=tk-inter",
+        "--include-package=chess",
+        f"--output-dir={OUTPUT_DIR}",
+    ]
+
+    # Движок кладём рядом с программой, если он есть
+    if os.path.exists("stockfish.exe"):
+        command.append("--include-data-files=stockfish.exe=stockfish.exe")
+
+    command.append(MAIN_SCRIPT)
+
+    print("Запуск:", " ".join(command))
+    return subprocess.run(command).returncode
+
+
+def build_bytecode():
+    """
+    Компиляция скриптов в оптимизированный байт-код (как python -OO)
+
+    Полученные .pyc запускаются напрямую: python chess_analyzer.pyc.
+    Байт-код привязан к версии Python, на которой выполнена сборка.
+    """
+    os.makedirs(BYTECODE_DIR, exist_ok=True)
+
+    for script in BYTECODE_SCRIPTS:
+        target = os.path.join(BYTECODE_DIR, os.path.splitext(script)[0] + ".pyc")
+        py_compile.compile(script, cfile=target, optimize=2, doraise=True)
+        print(f"✅ {script} -> {target}")
+
+    return 0
+
+
+# Режимы сборки: python build.py [nuitka|pyc]
+BUILDERS = {
+    "nuitka": build_nuitka,
+    "pyc": build_bytecode,
+}
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "nuitka"
+    if mode not in BUILDERS:
+        print(f"Неизвестный режим сборки: {mode}. Доступны: {', '.join(BUILDERS)}")
+        sys.exit(2)
+    sys.exit(BUILDERS[mode]())
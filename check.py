@@ -1,43 +1,112 @@
+import importlib.util
+import os
+import subprocess
+import sys
+from importlib.metadata import version, PackageNotFoundError
+
 print("=" * 50)
 print("ПРОВЕРКА УСТАНОВКИ БИБЛИОТЕК")
 print("=" * 50)
 print()
 
 # 1. Проверяем Python
-import sys
-print(f"1. Python версия: {sys.version[:6]}")
+print(f"1. Python версия: {sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}")
 print()
 
-# 2. Проверяем OpenCV
-try:
-    import cv2
-    print(f"2. ✅ OpenCV установлена, версия: {cv2.__version__}")
-except:
-    print("2. ❌ OpenCV НЕ установлена")
-    print("   Команда для установки: pip install opencv-python")
-print()
+# Проверяемые библиотеки: (название, модуль, пакет для установки,
+# пакеты pip, у которых ищется версия - по порядку, до первого найденного)
+# python-chess 1.999 - пустая обёртка над пакетом chess, поэтому версия
+# берётся сначала у chess, а для установки предлагается python-chess
+# find_spec только ищет модуль, не выполняя его импорт
+LIBRARIES = (
+    ("OpenCV", "cv2", "opencv-python",
+     ("opencv-python", "opencv-contrib-python", "opencv-python-headless")),
+    ("Python-chess", "chess", "python-chess", ("chess", "python-chess")),
+    ("NumPy", "numpy", "numpy", ("numpy",)),
+)
 
-# 3. Проверяем python-chess
-try:
-    import chess
-    print("3. ✅ Python-chess установлена")
-except:
-    print("3. ❌ Python-chess НЕ установлена")
-    print("   Команда для установки: pip install python-chess")
-print()
 
-# 4. Проверяем NumPy
-try:
-    import numpy as np
-    print(f"4. ✅ NumPy установлена, версия: {np.__version__}")
-except:
-    print("4. ❌ NumPy НЕ установлена")
-    print("   Команда для установки: pip install numpy")
-print()
+def probe(module):
+    """Есть ли модуль в окружении (без выполнения его кода)"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def package_version(packages):
+    """Версия пакета из его метаданных, без импорта модуля"""
+    for package in packages:
+        try:
+            return version(package)
+        except PackageNotFoundError:
+            continue
+    return None
+
+
+def print_import_profile(module="chess_analyzer", top=15):
+    """
+    Замер времени импорта модуля через python -X importtime
+
+    Импорт выполняется в отдельном процессе, чтобы замер не искажался
+    уже загруженными модулями. Выводит самые долгие импорты по общему времени.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, text=True)
+
+    # Строки вида: "import time:   self [us] | cumulative | imported package"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        timings.append((int(parts[1]), parts[2].strip()))
+
+    if result.returncode != 0 or not timings:
+        print(f"❌ Не удалось импортировать {module}")
+        return
+
+    print(f"ВРЕМЯ ИМПОРТА {module} (топ-{top}, мс):")
+    for cumulative, name in sorted(timings, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+    print()
+
+
+# Один проход поиска по всем библиотекам; метаданные читаем
+# только для найденных
+available = [probe(module) for _, module, _, _ in LIBRARIES]
+missing = [install for (_, _, install, _), found in zip(LIBRARIES, available) if not found]
+
+for number, ((title, _, install, packages), found) in enumerate(zip(LIBRARIES, available), start=2):
+    if found:
+        installed = package_version(packages)
+        if installed:
+            print(f"{number}. ✅ {title} установлена, версия: {installed}")
+        else:
+            print(f"{number}. ✅ {title} установлена")
+    else:
+        print(f"{number}. ❌ {title} НЕ установлена")
+        print(f"   Команда для установки: pip install {install}")
+    print()
+
+# Режим диагностики медленного запуска: python check.py --profile
+if "--profile" in sys.argv[1:]:
+    print_import_profile()
 
 print("=" * 50)
-print("ЕСЛИ ВСЕ 4 ПУНКТА С ГАЛОЧКАМИ ✅ — ВСЁ УСТАНОВЛЕНО!")
-print("ЕСЛИ ЕСТЬ КРЕСТИКИ ❌ — УСТАНОВИТЕ ЭТИ БИБЛИОТЕКИ")
+if missing:
+    print("ЕСТЬ КРЕСТИКИ ❌ — УСТАНОВИТЕ НЕДОСТАЮЩИЕ БИБЛИОТЕКИ:")
+    print(f"pip install {' '.join(missing)}")
+else:
+    print("ВСЕ ПУНКТЫ С ГАЛОЧКАМИ ✅ — ВСЁ УСТАНОВЛЕНО!")
 print("=" * 50)
 
-input("\nНажмите Enter для выхода...")
\ No newline at end of file
+# Ждём Enter только при запуске из консоли, чтобы скрипт
+# не зависал при вызове из лаунчера или другой программы
+if sys.stdin.isatty():
+    input("\nНажмите Enter для выхода...")
@@ -3,19 +3,137 @@
 # ВЕРСИЯ 2.2 - ИСПРАВЛЕНА ОШИБКА MULTIPV
 # ============================================
 
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
 import chess
-import chess.engine
+import chess.polyglot
+import functools
+import importlib
 import os
 import threading
 import time
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import sys
 
+# Точки входа модуля
+__all__ = ["ChessAnalyzerGUI", "main", "piece_counts", "material"]
+
+# Сколько проанализированных позиций хранить в кэше
+ANALYSIS_CACHE_SIZE = 4096
+
+# Сколько текстов статистики позиции хранить в кэше
+STATS_CACHE_SIZE = 128
+
+# После скольких неудачных анализов подряд (при работающем play)
+# движок считается не умеющим анализ
+ANALYSIS_FAILURE_LIMIT = 2
+
+# Уровни сложности Stockfish для выбора в интерфейсе
+_LEVELS = tuple(range(21))
+
+# Ценность фигур по chess.PIECE_TYPES (индекс 0 не используется):
+# для советов и для статистики позиции (слон чуть ценнее коня)
+_TIP_PIECE_VALUES = (0, 1, 3, 3, 5, 9, 0)
+_STATS_PIECE_VALUES = (0, 1, 3, 3.1, 5, 9, 0)
+
+# Центральные клетки e4, e5, d4, d5
+_CENTER_BB = chess.BB_E4 | chess.BB_E5 | chess.BB_D4 | chess.BB_D5
+
+# Права на рокировку стороны по маске: бит 0 - короткая, бит 1 - длинная
+_CASTLING_WHITE = ("", "K", "Q", "KQ")
+_CASTLING_BLACK = ("", "k", "q", "kq")
+
+
+def piece_counts(board):
+    """
+    Число фигур каждого типа у белых и чёрных
+
+    Возвращает два кортежа по chess.PIECE_TYPES (пешка ... король).
+    Не зависит от интерфейса, поэтому подходит и для пакетного
+    анализа многих позиций.
+    """
+    popcount = chess.popcount
+    return (
+        tuple(popcount(board.pieces_mask(piece_type, chess.WHITE)) for piece_type in chess.PIECE_TYPES),
+        tuple(popcount(board.pieces_mask(piece_type, chess.BLACK)) for piece_type in chess.PIECE_TYPES),
+    )
+
+
+def material(counts, values):
+    """Сумма материала по числу фигур counts и таблице ценностей values"""
+    return sum(count * value for count, value in zip(counts, values[1:]))
+
+
+def _white_score(score):
+    """
+    Оценка движка с точки зрения белых: (мат в N ходов или None, сантипешки)
+
+    Принимает как PovScore из информации движка, так и простой Score.
+    """
+    import chess.engine
+
+    if isinstance(score, chess.engine.PovScore):
+        score = score.white()
+    mate_in = score.mate()
+    if mate_in is not None:
+        return mate_in, None
+    return None, score.score() or 0
+
+
+# Tkinter импортируется только при запуске интерфейса,
+# чтобы импорт модуля не инициализировал _tkinter.
+# Диалоги файлов и ввода нужны лишь в командах меню и
+# импортируются там же, при первом вызове
+tk = ttk = messagebox = scrolledtext = None
+
+
+def _import_tk():
+    """Импорт Tkinter и подмодулей, нужных для главного окна"""
+    global tk, ttk, messagebox, scrolledtext
+    import tkinter as tk
+    from tkinter import ttk, messagebox, scrolledtext
+
 
 class ChessAnalyzerGUI:
+    # Кнопки выбора фигуры при превращении: (надпись, фигура, цвет кнопки)
+    _PROMO_WHITE = (
+        ("♕ Ферзь (самая сильная)", chess.QUEEN, "#4CAF50"),
+        ("♖ Ладья", chess.ROOK, "#2196F3"),
+        ("♗ Слон", chess.BISHOP, "#FF9800"),
+        ("♘ Конь (может прыгать)", chess.KNIGHT, "#9C27B0"),
+    )
+    _PROMO_BLACK = (
+        ("♛ Ферзь (самая сильная)", chess.QUEEN, "#4CAF50"),
+        ("♜ Ладья", chess.ROOK, "#2196F3"),
+        ("♝ Слон", chess.BISHOP, "#FF9800"),
+        ("♞ Конь (может прыгать)", chess.KNIGHT, "#9C27B0"),
+    )
+
+    # Статус партии по причине её окончания (остальные причины - "игра идёт")
+    _STATUS_BY_TERMINATION = {
+        chess.Termination.CHECKMATE: "ШАХ И МАТ!",
+        chess.Termination.STALEMATE: "ПАТ",
+        chess.Termination.INSUFFICIENT_MATERIAL: "НЕДОСТАТОК МАТЕРИАЛА",
+    }
+
+    # Шаблон информационной панели (см. update_info_text)
+    _INFO_TMPL = (
+        "╔══════════════════════════════════════╗\n"
+        "║         ИНФОРМАЦИЯ О ПОЗИЦИИ         ║\n"
+        "╠══════════════════════════════════════╣\n"
+        "║ Статус: {status:26} ║\n"
+        "║ Ход: {turn:29} ║\n"
+        "║ Всего ходов: {moves:22} ║\n"
+        "║ Возможных ходов: {legal:19} ║\n"
+        "╠══════════════════════════════════════╣\n"
+        "║              FEN СТРОКА              ║\n"
+        "╠══════════════════════════════════════╣\n"
+        "{fen}\n"
+        "╚══════════════════════════════════════╝\n"
+    )
+
     def __init__(self, root):
+        _import_tk()
+
         self.root = root
         self.root.title("ШАХМАТНЫЙ АНАЛИЗАТОР v2.2")
         self.root.geometry("1200x800")
@@ -26,15 +144,38 @@ class ChessAnalyzerGUI:
         # Настройки программы
         self.engine_path = "stockfish.exe"
         self.engine = None
+        self._engine_skill = None  # Уровень сложности, переданный движку
+        self._can_analyse = True  # Сбрасывается, если движок не умеет анализ
+        self._analysis_failures = 0  # Неудачные анализы подряд
+        self._analysis_warning = None  # Сообщение для poll_analysis от потока движка
         self.board = chess.Board()  # Начальная позиция
         self.analysis_time = 3.0
         self.is_analyzing = False
         self.selected_square = None
         self.best_move = None
 
+        # Кэш анализа: (хэш Зобриста позиции, уровень) ->
+        # (лучший ход, готовый текст результата, время анализа)
+        self._analysis_cache = OrderedDict()
+
+        # Кэш сведений для информационной панели (см. compute_status)
+        self._info_cache_key = None
+        self._info_cache = None
+        self._info_shown = None  # Сведения, которые сейчас на панели
+
+        # Кэш текста статистики: ключ позиции (см. position_key) -> текст
+        self._stats_cache = OrderedDict()
+
+        # Доля выполненного анализа (0-99), пишет поток движка
+        self._analysis_progress = 0
+
+        # Единственный поток для работы с движком
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="engine")
+
         # Переменные для превращения пешки
         self.promotion_move = None  # Ход, требующий превращения
-        self.promotion_dialog = None  # Окно выбора фигуры
+        self.promotion_dialog = None  # Окно выбора фигуры (создаётся один раз)
+        self._promo_buttons = []  # Кнопки фигур в окне выбора
 
         # Unicode символы для фигур
         self.piece_symbols = {
@@ -42,6 +183,33 @@ class ChessAnalyzerGUI:
             'R': '♖', 'N': '♘', 'B': '♗', 'Q': '♕', 'K': '♔', 'P': '♙'
         }
 
+        # Символы для отрисовки по индексу piece_type * 2 + (0 - белые, 1 - чёрные)
+        self._symbol_by_piece = [None] * 14
+        for piece_type in chess.PIECE_TYPES:
+            symbol = chess.piece_symbol(piece_type)
+            self._symbol_by_piece[piece_type * 2] = self.piece_symbols[symbol.upper()]
+            self._symbol_by_piece[piece_type * 2 + 1] = self.piece_symbols[symbol]
+
+        # Цвет фигуры и тени по цвету фигуры (False - чёрные, True - белые)
+        self._fill_by_color = (("black", "#333"), ("white", "gray"))
+
+        # Готовые картинки фигур по тому же индексу (None - рисуем текстом)
+        self._piece_sprites = self.load_piece_sprites()
+
+        # Геометрия клеток по номеру клетки: центр и рамка подсветки,
+        # а также номер клетки по строке и столбцу холста (белые снизу)
+        cell = 60
+        self._sq_center = tuple(
+            ((s & 7) * cell + cell // 2, (7 - (s >> 3)) * cell + cell // 2)
+            for s in range(64)
+        )
+        self._sq_bbox = tuple(
+            ((s & 7) * cell + 2, (7 - (s >> 3)) * cell + 2,
+             (s & 7) * cell + cell - 2, (7 - (s >> 3)) * cell + cell - 2)
+            for s in range(64)
+        )
+        self._sq_by_cell = tuple(chess.square(i & 7, 7 - (i >> 3)) for i in range(64))
+
         # Названия фигур на русском
         self.piece_names = {
             'r': 'Ладья', 'n': 'Конь', 'b': 'Слон', 'q': 'Ферзь', 'k': 'Король', 'p': 'Пешка',
@@ -68,15 +236,17 @@ class ChessAnalyzerGUI:
         # Создаём интерфейс
         self.create_widgets()
 
-        # Загружаем движок Stockfish
-        self.load_engine()
-
         # Обновляем отображение
         self.update_display()
 
         # Запускаем обновление времени
+        self._last_clock_text = None
         self.update_clock()
 
+        # Загружаем движок Stockfish, когда окно уже показано
+        self._engine_future = None
+        self.root.after(0, self.load_engine)
+
     def center_window(self):
         """Центрирование окна на экране"""
         self.root.update_idletasks()
@@ -124,38 +294,24 @@ class ChessAnalyzerGUI:
         menubar = tk.Menu(self.root)
         self.root.config(menu=menubar)
 
-        # Меню "Файл"
+        # Пункты подменю добавляются при первом открытии (postcommand),
+        # а не при запуске программы
         file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.config(postcommand=functools.partial(self.build_file_menu, file_menu))
         menubar.add_cascade(label="📁 Файл", menu=file_menu)
-        file_menu.add_command(label="🆕 Новая игра", command=self.new_game, accelerator="Ctrl+N")
-        file_menu.add_command(label="📂 Загрузить FEN...", command=self.load_fen_dialog, accelerator="Ctrl+O")
-        file_menu.add_command(label="💾 Сохранить FEN...", command=self.save_fen_dialog, accelerator="Ctrl+S")
-        file_menu.add_separator()
-        file_menu.add_command(label="🚪 Выход", command=self.on_closing, accelerator="Alt+F4")
 
-        # Меню "Анализ"
         analysis_menu = tk.Menu(menubar, tearoff=0)
+        analysis_menu.config(postcommand=functools.partial(self.build_analysis_menu, analysis_menu))
         menubar.add_cascade(label="🔍 Анализ", menu=analysis_menu)
-        analysis_menu.add_command(label="⚡ Быстрый анализ (1 сек)",
-                                  command=lambda: self.set_analysis_time(1.0))
-        analysis_menu.add_command(label="⏱️ Стандартный анализ (3 сек)",
-                                  command=lambda: self.set_analysis_time(3.0))
-        analysis_menu.add_command(label="🔍 Глубокий анализ (10 сек)",
-                                  command=lambda: self.set_analysis_time(10.0))
-        analysis_menu.add_separator()
-        analysis_menu.add_command(label="📊 Показать статистику позиции",
-                                  command=self.show_position_stats)
-
-        # Меню "Помощь"
+
         help_menu = tk.Menu(menubar, tearoff=0)
+        help_menu.config(postcommand=functools.partial(self.build_help_menu, help_menu))
         menubar.add_cascade(label="❓ Помощь", menu=help_menu)
-        help_menu.add_command(label="📖 Инструкция", command=self.show_instructions)
-        help_menu.add_command(label="ℹ️ О программе", command=self.show_about)
 
         # Привязываем горячие клавиши
-        self.root.bind('<Control-n>', lambda e: self.new_game())
-        self.root.bind('<Control-o>', lambda e: self.load_fen_dialog())
-        self.root.bind('<Control-s>', lambda e: self.save_fen_dialog())
+        self.root.bind('<Control-n>', self.new_game)
+        self.root.bind('<Control-o>', self.load_fen_dialog)
+        self.root.bind('<Control-s>', self.save_fen_dialog)
 
         # ===== ГЛАВНЫЙ КОНТЕЙНЕР =====
         main_container = ttk.Frame(self.root, padding="10")
@@ -177,6 +333,28 @@ class ChessAnalyzerGUI:
         self.board_canvas.grid(row=0, column=0, pady=(0, 15))
         self.board_canvas.bind("<Button-1>", self.on_board_click)
 
+        # Нарисованные фигуры: клетка -> (id тени, id фигуры) и клетка -> фигура
+        self._piece_items = {}
+        self._last_pieces = {}
+        self._drawn_key = None  # Что изображено на доске (см. draw_board)
+        self.init_static_board()
+
+        # Подсветка создаётся один раз скрытой; при отрисовке
+        # у неё меняются только координаты и видимость
+        self._hl_selected = self.board_canvas.create_rectangle(
+            0, 0, 0, 0, outline=self.colors["highlight"], width=3,
+            state="hidden", tags="overlay")
+        self._hl_best_from = self.board_canvas.create_rectangle(
+            0, 0, 0, 0, outline=self.colors["best_move"], width=3,
+            state="hidden", tags="overlay")
+        self._hl_best_to = self.board_canvas.create_rectangle(
+            0, 0, 0, 0, outline=self.colors["good_move"], width=3,
+            state="hidden", tags="overlay")
+        self._hl_arrow = self.board_canvas.create_line(
+            0, 0, 0, 0, fill=self.colors["best_move"], width=2,
+            arrow=tk.LAST, arrowshape=(10, 12, 6),
+            state="hidden", tags="overlay")
+
         # Панель управления доской
         board_controls = ttk.Frame(left_panel)
         board_controls.grid(row=1, column=0, sticky=(tk.W, tk.E))
@@ -192,10 +370,13 @@ class ChessAnalyzerGUI:
         info_frame = ttk.LabelFrame(left_panel, text="ИНФОРМАЦИЯ О ПОЗИЦИИ", padding="10")
         info_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
 
-        # Текстовая информация
-        info_text = tk.Text(info_frame, height=8, width=45, font=("Consolas", 9),
-                            bg=self.colors["bg_dark"], fg=self.colors["text_light"],
-                            relief=tk.FLAT, borderwidth=0)
+        # Текстовая информация: метка со строкой вместо Text,
+        # текст целиком меняется одной командой
+        self.info_var = tk.StringVar()
+        info_text = tk.Label(info_frame, textvariable=self.info_var, width=45,
+                             font=("Consolas", 9), justify=tk.LEFT, anchor="nw",
+                             bg=self.colors["bg_dark"], fg=self.colors["text_light"],
+                             relief=tk.FLAT, borderwidth=0)
         info_text.pack()
         self.info_text = info_text
 
@@ -233,10 +414,11 @@ class ChessAnalyzerGUI:
 
         self.level_var = tk.IntVar(value=20)
         level_combo = ttk.Combobox(level_frame, textvariable=self.level_var,
-                                   values=list(range(21)), width=5, state="readonly",
+                                   values=_LEVELS, width=5, state="readonly",
                                    font=("Arial", 10))
         level_combo.pack(side=tk.LEFT, padx=10)
         level_combo.set(20)
+        level_combo.bind("<<ComboboxSelected>>", self.on_level_change)
 
         ttk.Label(level_frame, text="(0 - новичок, 20 - гроссмейстер)").pack(side=tk.LEFT)
 
@@ -305,7 +487,12 @@ class ChessAnalyzerGUI:
                   font=("Arial", 8)).pack(side=tk.RIGHT)
 
     def load_engine(self):
-        """Загрузка шахматного движка Stockfish"""
+        """
+        Загрузка шахматного движка Stockfish
+
+        Запуск процесса и рукопожатие UCI идут в потоке движка,
+        интерфейс тем временем остаётся отзывчивым (см. poll_engine_load).
+        """
         self.status_var.set("🔍 Загружаю Stockfish...")
 
         if not os.path.exists(self.engine_path):
@@ -316,22 +503,158 @@ class ChessAnalyzerGUI:
             self.engine = None
             return
 
+        self._engine_future = self._executor.submit(self.open_engine, self.engine_path,
+                                                    self.level_var.get())
+        self.root.after(100, self.poll_engine_load)
+
+    def open_engine(self, engine_path, skill_level):
+        """
+        Запуск и начальная настройка движка (в потоке движка, без Tk)
+
+        Уровень сложности уходит вместе с постоянными настройками,
+        одной командой. Возвращает (движок, применённый уровень).
+        """
+        # chess.engine тянет за собой asyncio и subprocess,
+        # поэтому импортируем его только когда движок действительно нужен
+        import chess.engine
+
+        engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+        try:
+            # Постоянные настройки задаются один раз на всё время работы движка.
+            # Процесс живёт до закрытия программы, а ucinewgame python-chess
+            # посылает только перед первым поиском, поэтому хэш-таблица
+            # движка сохраняется между анализами родственных позиций.
+            # Ponder не задаём: этой настройкой управляет сам python-chess
+            self.configure_engine(engine, {
+                "Threads": max(1, (os.cpu_count() or 2) - 1),
+                "Hash": 256,
+                "Skill Level": skill_level,
+            })
+        except Exception:
+            engine.quit()
+            raise
+        return engine, skill_level
+
+    def poll_engine_load(self):
+        """Проверка завершения загрузки движка (в потоке Tk)"""
+        if not self._engine_future.done():
+            self.root.after(100, self.poll_engine_load)
+            return
+
         try:
-            self.engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
+            self.engine, self._engine_skill = self._engine_future.result()
+
+            # Уровень могли сменить, пока движок загружался
+            self.apply_skill_level()
             self.status_var.set(f"✅ Stockfish загружен: {self.engine.id['name']}")
         except Exception as e:
             self.show_error("Ошибка загрузки Stockfish", str(e))
             self.engine = None
+        finally:
+            self._engine_future = None
+
+    def configure_engine(self, engine, options):
+        """Передача движку только тех UCI-настроек, которые он поддерживает"""
+        supported = {name: value for name, value in options.items()
+                     if name in engine.options}
+        if supported:
+            engine.configure(supported)
+
+    def apply_skill_level(self):
+        """
+        Передача движку уровня сложности, если он изменился
+
+        Во время анализа настройку не отправляем: новая команда движку
+        прервала бы текущий поиск. Уровень применится при следующем запуске.
+        """
+        if not self.engine or self.is_analyzing:
+            return
+
+        skill_level = self.level_var.get()
+        if skill_level != self._engine_skill:
+            self.configure_engine(self.engine, {"Skill Level": skill_level})
+            self._engine_skill = skill_level
+
+    def on_level_change(self, event=None):
+        """Обработка выбора уровня сложности"""
+        self.apply_skill_level()
 
     def update_display(self):
         """Обновление всего отображения"""
         self.draw_board()
         self.update_info_text()
 
-    def draw_board(self):
-        """Отрисовка шахматной доски"""
-        self.board_canvas.delete("all")
+    def load_piece_sprites(self):
+        """
+        Однократная отрисовка фигур с тенью в картинки 60x60 через Pillow
+
+        Канвас выводит готовую картинку одним элементом вместо двух
+        текстов, которые Tk заново растеризует при каждой отрисовке.
+        Возвращает None, если нет Pillow или шрифта с шахматными символами.
+        """
+        try:
+            from PIL import Image, ImageDraw, ImageFont, ImageTk
+        except ImportError:
+            return None
 
+        # Шрифт с шахматными символами: Segoe UI Symbol в Windows, DejaVu в Linux
+        font = None
+        for font_name in ("seguisym.ttf", "DejaVuSans.ttf"):
+            try:
+                font = ImageFont.truetype(font_name, 42)
+                break
+            except OSError:
+                continue
+        if font is None:
+            return None
+
+        sprites = [None] * 14
+        for index, symbol in enumerate(self._symbol_by_piece):
+            if symbol is None:
+                continue
+            fill_color, shadow_color = self._fill_by_color[index % 2 == 0]
+
+            image = Image.new("RGBA", (60, 60), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(image)
+            draw.text((31, 31), symbol, font=font, fill=shadow_color, anchor="mm")
+            draw.text((30, 30), symbol, font=font, fill=fill_color, anchor="mm")
+            sprites[index] = ImageTk.PhotoImage(image, master=self.root)
+
+        return sprites
+
+    def build_file_menu(self, menu):
+        """Заполнение меню "Файл" при первом открытии"""
+        if menu.index("end") is not None:
+            return
+        menu.add_command(label="🆕 Новая игра", command=self.new_game, accelerator="Ctrl+N")
+        menu.add_command(label="📂 Загрузить FEN...", command=self.load_fen_dialog, accelerator="Ctrl+O")
+        menu.add_command(label="💾 Сохранить FEN...", command=self.save_fen_dialog, accelerator="Ctrl+S")
+        menu.add_separator()
+        menu.add_command(label="🚪 Выход", command=self.on_closing, accelerator="Alt+F4")
+
+    def build_analysis_menu(self, menu):
+        """Заполнение меню "Анализ" при первом открытии"""
+        if menu.index("end") is not None:
+            return
+        menu.add_command(label="⚡ Быстрый анализ (1 сек)",
+                         command=functools.partial(self.set_analysis_time, 1.0))
+        menu.add_command(label="⏱️ Стандартный анализ (3 сек)",
+                         command=functools.partial(self.set_analysis_time, 3.0))
+        menu.add_command(label="🔍 Глубокий анализ (10 сек)",
+                         command=functools.partial(self.set_analysis_time, 10.0))
+        menu.add_separator()
+        menu.add_command(label="📊 Показать статистику позиции",
+                         command=self.show_position_stats)
+
+    def build_help_menu(self, menu):
+        """Заполнение меню "Помощь" при первом открытии"""
+        if menu.index("end") is not None:
+            return
+        menu.add_command(label="📖 Инструкция", command=self.show_instructions)
+        menu.add_command(label="ℹ️ О программе", command=self.show_about)
+
+    def init_static_board(self):
+        """Однократная отрисовка клеток и координат доски"""
         cell_size = 60
         board_size = cell_size * 8
 
@@ -376,28 +699,69 @@ class ChessAnalyzerGUI:
                 fill="black"
             )
 
-        # Рисуем фигуры
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                row = 7 - (square // 8)
-                col = square % 8
+    def draw_board(self):
+        """
+        Отрисовка шахматной доски
 
-                x = col * cell_size + cell_size // 2
-                y = row * cell_size + cell_size // 2
+        Клетки и координаты нарисованы один раз в init_static_board,
+        здесь обновляются только клетки, где фигура изменилась
+        с прошлой отрисовки. Подсветка не пересоздаётся, а переносится.
+        Если не изменились ни фигуры, ни выбор, ни лучший ход - ничего не делаем.
+        """
+        board = self.board
+        drawn_key = (board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK],
+                     board.pawns, board.knights, board.bishops, board.rooks, board.queens,
+                     self.selected_square, self.best_move)
+        if drawn_key == self._drawn_key:
+            return
+        self._drawn_key = drawn_key
 
-                symbol = self.piece_symbols.get(piece.symbol(), piece.symbol())
+        # Прячем подсветку прошлой отрисовки
+        self.board_canvas.itemconfigure("overlay", state="hidden")
+        pieces_created = False
 
-                # Цвет фигуры
-                if piece.color == chess.WHITE:
-                    fill_color = "white"
-                    shadow_color = "gray"
+        # Только занятые клетки, без перебора всех 64
+        pieces = self.board.piece_map()
+
+        # Убираем фигуры с освободившихся клеток
+        for square in self._last_pieces.keys() - pieces.keys():
+            self.board_canvas.delete(*self._piece_items.pop(square))
+            del self._last_pieces[square]
+
+        # Рисуем фигуры
+        for square, piece in pieces.items():
+            if piece == self._last_pieces.get(square):
+                continue
+
+            items = self._piece_items.get(square)
+            index = piece.piece_type * 2 + (0 if piece.color else 1)
+
+            if self._piece_sprites:
+                # Фигура - одна готовая картинка
+                if items:
+                    self.board_canvas.itemconfigure(items[0], image=self._piece_sprites[index])
                 else:
-                    fill_color = "black"
-                    shadow_color = "#333"
+                    x, y = self._sq_center[square]
+                    self._piece_items[square] = (
+                        self.board_canvas.create_image(x, y, image=self._piece_sprites[index]),
+                    )
+                    pieces_created = True
+                self._last_pieces[square] = piece
+                continue
+
+            symbol = self._symbol_by_piece[index]
+            fill_color, shadow_color = self._fill_by_color[piece.color]
+
+            if items:
+                # Меняем уже нарисованную фигуру
+                shadow_id, piece_id = items
+                self.board_canvas.itemconfigure(shadow_id, text=symbol, fill=shadow_color)
+                self.board_canvas.itemconfigure(piece_id, text=symbol, fill=fill_color)
+            else:
+                x, y = self._sq_center[square]
 
                 # Рисуем тень (для объёма)
-                self.board_canvas.create_text(
+                shadow_id = self.board_canvas.create_text(
                     x + 1, y + 1,
                     text=symbol,
                     font=("Segoe UI Symbol", 32),
@@ -405,82 +769,53 @@ class ChessAnalyzerGUI:
                 )
 
                 # Рисуем фигуру
-                self.board_canvas.create_text(
+                piece_id = self.board_canvas.create_text(
                     x, y,
                     text=symbol,
                     font=("Segoe UI Symbol", 32),
                     fill=fill_color
                 )
+                self._piece_items[square] = (shadow_id, piece_id)
+                pieces_created = True
+
+            self._last_pieces[square] = piece
+
+        # Новые фигуры легли поверх подсветки - поднимаем её обратно
+        if pieces_created:
+            self.board_canvas.tag_raise("overlay")
 
         # Подсвечиваем выбранную клетку
         if self.selected_square is not None:
-            self.highlight_square(self.selected_square, self.colors["highlight"])
+            self.highlight_square(self._hl_selected, self.selected_square)
 
         # Подсвечиваем лучший ход
         if self.best_move:
             self.highlight_move(self.best_move)
 
-    def highlight_square(self, square, color):
-        """Подсветка клетки на доске"""
-        row = 7 - (square // 8)
-        col = square % 8
-        cell_size = 60
-
-        x1 = col * cell_size + 2
-        y1 = row * cell_size + 2
-        x2 = x1 + cell_size - 4
-        y2 = y1 + cell_size - 4
-
-        self.board_canvas.create_rectangle(x1, y1, x2, y2,
-                                           outline=color, width=3)
+    def highlight_square(self, item, square):
+        """Перенос рамки подсветки item на клетку доски"""
+        self.board_canvas.coords(item, *self._sq_bbox[square])
+        self.board_canvas.itemconfigure(item, state="normal")
 
     def highlight_move(self, move):
         """Подсветка хода на доске"""
         # Подсвечиваем откуда
-        self.highlight_square(move.from_square, self.colors["best_move"])
+        self.highlight_square(self._hl_best_from, move.from_square)
 
         # Подсвечиваем куда
-        self.highlight_square(move.to_square, self.colors["good_move"])
+        self.highlight_square(self._hl_best_to, move.to_square)
 
         # Рисуем стрелку
         self.draw_arrow(move.from_square, move.to_square)
 
     def draw_arrow(self, from_sq, to_sq):
         """Рисование стрелки на доске"""
-        cell_size = 60
-
-        from_row = 7 - (from_sq // 8)
-        from_col = from_sq % 8
-        to_row = 7 - (to_sq // 8)
-        to_col = to_sq % 8
+        x1, y1 = self._sq_center[from_sq]
+        x2, y2 = self._sq_center[to_sq]
 
-        x1 = from_col * cell_size + cell_size // 2
-        y1 = from_row * cell_size + cell_size // 2
-        x2 = to_col * cell_size + cell_size // 2
-        y2 = to_row * cell_size + cell_size // 2
-
-        # Рисуем линию
-        self.board_canvas.create_line(x1, y1, x2, y2,
-                                      fill=self.colors["best_move"],
-                                      width=2, arrow=tk.LAST,
-                                      arrowshape=(10, 12, 6))
-
-    def check_promotion(self, move: chess.Move) -> bool:
-        """
-        Проверяет, требует ли ход превращения пешки
-        """
-        piece = self.board.piece_at(move.from_square)
-        if not piece or piece.piece_type != chess.PAWN:
-            return False
-
-        # Проверяем, достигла ли пешка последней горизонтали
-        target_rank = chess.square_rank(move.to_square)
-        if piece.color == chess.WHITE and target_rank == 7:
-            return True
-        elif piece.color == chess.BLACK and target_rank == 0:
-            return True
-
-        return False
+        # Переносим линию
+        self.board_canvas.coords(self._hl_arrow, x1, y1, x2, y2)
+        self.board_canvas.itemconfigure(self._hl_arrow, state="normal")
 
     def on_board_click(self, event):
         """Обработка клика по шахматной доске"""
@@ -492,37 +827,39 @@ class ChessAnalyzerGUI:
         row = event.y // cell_size
 
         if 0 <= col < 8 and 0 <= row < 8:
-            square = chess.square(col, 7 - row)
+            square = self._sq_by_cell[row * 8 + col]
 
             if self.selected_square is None:
                 # Выбираем фигуру
                 piece = self.board.piece_at(square)
                 if piece and piece.color == self.board.turn:
                     self.selected_square = square
-                    self.highlight_square(square, self.colors["highlight"])
+                    self.draw_board()
             else:
-                # Пытаемся сделать ход
+                # Пытаемся сделать ход: find_move проверяет легальность
+                # и для пешки на последней горизонтали подставляет ферзя
                 try:
-                    move = chess.Move(self.selected_square, square)
-
-                    # Проверяем, возможен ли ход
-                    if move in self.board.legal_moves:
-                        # Проверяем, нужно ли превращение
-                        if self.check_promotion(move):
-                            # Показываем диалог выбора фигуры
-                            self.promotion_move = move
-                            self.show_promotion_dialog(move)
-                        else:
-                            # Обычный ход
-                            self.board.push(move)
-                            self.selected_square = None
-                            self.best_move = None
-                            self.update_display()
-                            self.status_var.set(f"✅ Ход {self.board.san(move)} сделан")
-                    else:
+                    try:
+                        move = self.board.find_move(self.selected_square, square)
+                    except chess.IllegalMoveError:
+                        move = None
+
+                    if move is None:
                         self.selected_square = None
                         self.update_display()
                         self.status_var.set("❌ Невозможный ход")
+                    elif move.promotion:
+                        # Показываем диалог выбора фигуры
+                        self.promotion_move = move
+                        self.show_promotion_dialog(move)
+                    else:
+                        # Обычный ход
+                        san = self.board.san(move)
+                        self.board.push(move)
+                        self.selected_square = None
+                        self.best_move = None
+                        self.update_display()
+                        self.status_var.set(f"✅ Ход {san} сделан")
 
                 except Exception as e:
                     self.selected_square = None
@@ -530,15 +867,30 @@ class ChessAnalyzerGUI:
                     self.status_var.set(f"❌ Ошибка: {str(e)}")
 
     def show_promotion_dialog(self, move: chess.Move):
-        """Показывает диалог выбора фигуры для превращения пешки"""
-        # Закрываем предыдущий диалог, если есть
-        if self.promotion_dialog:
-            try:
-                self.promotion_dialog.destroy()
-            except:
-                pass
+        """
+        Показывает диалог выбора фигуры для превращения пешки
+
+        Окно создаётся при первом превращении, затем только
+        прячется и показывается снова с новыми надписями и командами.
+        """
+        if self.promotion_dialog is None:
+            self.create_promotion_dialog()
+        dialog = self.promotion_dialog
+
+        # Символы и названия фигур (зависит от цвета)
+        piece = self.board.piece_at(move.from_square)
+        pieces = self._PROMO_WHITE if piece.color == chess.WHITE else self._PROMO_BLACK
+
+        for btn, (text, piece_type, color) in zip(self._promo_buttons, pieces):
+            btn.config(text=text, bg=color,
+                       command=functools.partial(self.apply_promotion, move, piece_type))
+
+        dialog.deiconify()
+        dialog.lift()
+        dialog.grab_set()
 
-        # Создаём новое окно выбора
+    def create_promotion_dialog(self):
+        """Однократное создание окна выбора фигуры"""
         dialog = tk.Toplevel(self.root)
         dialog.title("🎯 Превращение пешки")
         dialog.geometry("400x300")
@@ -547,11 +899,9 @@ class ChessAnalyzerGUI:
 
         # Центрируем окно
         dialog.transient(self.root)
-        dialog.grab_set()
 
-        # Определяем цвет фигуры
-        piece = self.board.piece_at(move.from_square)
-        is_white = piece.color == chess.WHITE
+        # Закрытие окна только прячет его
+        dialog.protocol("WM_DELETE_WINDOW", self.hide_promotion_dialog)
 
         # Заголовок
         label = ttk.Label(dialog,
@@ -565,39 +915,31 @@ class ChessAnalyzerGUI:
         button_frame = ttk.Frame(dialog)
         button_frame.pack(pady=10)
 
-        # Символы и названия фигур (зависит от цвета)
-        if is_white:
-            pieces = [
-                ("♕ Ферзь (самая сильная)", chess.QUEEN, "#4CAF50"),
-                ("♖ Ладья", chess.ROOK, "#2196F3"),
-                ("♗ Слон", chess.BISHOP, "#FF9800"),
-                ("♘ Конь (может прыгать)", chess.KNIGHT, "#9C27B0")
-            ]
-        else:
-            pieces = [
-                ("♛ Ферзь (самая сильная)", chess.QUEEN, "#4CAF50"),
-                ("♜ Ладья", chess.ROOK, "#2196F3"),
-                ("♝ Слон", chess.BISHOP, "#FF9800"),
-                ("♞ Конь (может прыгать)", chess.KNIGHT, "#9C27B0")
-            ]
-
-        # Создаём кнопки для каждой фигуры
-        for i, (text, piece_type, color) in enumerate(pieces):
-            btn = tk.Button(button_frame, text=text, font=("Arial", 11, "bold"),
-                            bg=color, fg="white", relief="raised", borderwidth=2,
-                            width=25, height=2,
-                            command=lambda pt=piece_type: self.apply_promotion(move, pt, dialog))
+        # Кнопки для каждой фигуры; надписи и команды задаются при показе
+        self._promo_buttons = []
+        for _ in self._PROMO_WHITE:
+            btn = tk.Button(button_frame, font=("Arial", 11, "bold"),
+                            fg="white", relief="raised", borderwidth=2,
+                            width=25, height=2)
             btn.pack(pady=5)
+            self._promo_buttons.append(btn)
 
         # Кнопка отмены
         cancel_btn = ttk.Button(dialog, text="Отмена",
-                                command=dialog.destroy)
+                                command=self.hide_promotion_dialog)
         cancel_btn.pack(pady=10)
 
         # Сохраняем ссылку на диалог
         self.promotion_dialog = dialog
 
-    def apply_promotion(self, move: chess.Move, promotion_piece: int, dialog: tk.Toplevel):
+    def hide_promotion_dialog(self):
+        """Скрывает окно выбора фигуры, не уничтожая его"""
+        if self.promotion_dialog is None:
+            return
+        self.promotion_dialog.grab_release()
+        self.promotion_dialog.withdraw()
+
+    def apply_promotion(self, move: chess.Move, promotion_piece: int):
         """Применяет выбранное превращение"""
         try:
             # Создаём ход с превращением
@@ -608,7 +950,7 @@ class ChessAnalyzerGUI:
             )
 
             # Проверяем, возможен ли ход
-            if promotion_move in self.board.legal_moves:
+            if self.board.is_legal(promotion_move):
                 self.board.push(promotion_move)
                 self.selected_square = None
                 self.best_move = None
@@ -639,53 +981,75 @@ class ChessAnalyzerGUI:
             self.status_var.set(f"❌ Ошибка: {str(e)}")
 
         finally:
-            # Закрываем диалог
-            try:
-                dialog.destroy()
-            except:
-                pass
-            self.promotion_dialog = None
+            # Прячем диалог до следующего превращения
+            self.hide_promotion_dialog()
 
-    def update_info_text(self):
-        """Обновление текстовой информации о позиции"""
-        self.info_text.config(state=tk.NORMAL)
-        self.info_text.delete(1.0, tk.END)
-
-        # Определяем статус игры
-        if self.board.is_checkmate():
-            status = "ШАХ И МАТ!"
-        elif self.board.is_stalemate():
-            status = "ПАТ"
-        elif self.board.is_insufficient_material():
-            status = "НЕДОСТАТОК МАТЕРИАЛА"
+    def position_key(self):
+        """
+        Ключ текущей позиции для кэшей сведений о ней
+
+        Хэш Зобриста не учитывает счётчики ходов, поэтому они
+        добавляются к ключу отдельно.
+        """
+        return (chess.polyglot.zobrist_hash(self.board), len(self.board.move_stack),
+                self.board.halfmove_clock, self.board.fullmove_number)
+
+    def compute_status(self):
+        """
+        Сведения о позиции для информационной панели
+
+        Возвращает (статус, чей ход, всего ходов, возможных ходов, FEN).
+        Пересчитывается только при смене позиции: подсчёт возможных ходов
+        требует полной генерации ходов.
+        """
+        key = self.position_key()
+        if key == self._info_cache_key:
+            return self._info_cache
+
+        # Определяем статус игры: outcome() проверяет конец партии за один проход
+        outcome = self.board.outcome()
+        if outcome and outcome.termination in self._STATUS_BY_TERMINATION:
+            status = self._STATUS_BY_TERMINATION[outcome.termination]
         elif self.board.is_check():
             status = "ШАХ"
         else:
             status = "ИГРА ИДЁТ"
 
-        # Собираем информацию
-        info = f"""╔══════════════════════════════════════╗
-║         ИНФОРМАЦИЯ О ПОЗИЦИИ         ║
-╠══════════════════════════════════════╣
-║ Статус: {status:26} ║
-║ Ход: {'белых' if self.board.turn == chess.WHITE else 'чёрных':29} ║
-║ Всего ходов: {len(self.board.move_stack):22} ║
-║ Возможных ходов: {self.board.legal_moves.count():19} ║
-╠══════════════════════════════════════╣
-║              FEN СТРОКА              ║
-╠══════════════════════════════════════╣
-{self.board.fen()}
-╚══════════════════════════════════════╝
-"""
-
-        self.info_text.insert(1.0, info)
-        self.info_text.config(state=tk.DISABLED)
+        self._info_cache = (
+            status,
+            'белых' if self.board.turn == chess.WHITE else 'чёрных',
+            len(self.board.move_stack),
+            self.board.legal_moves.count(),
+            self.board.fen()
+        )
+        self._info_cache_key = key
+        return self._info_cache
+
+    def update_info_text(self):
+        """Обновление текстовой информации о позиции"""
+        info = self.compute_status()
+
+        # Позиция не менялась - метка уже показывает этот текст
+        if info is self._info_shown:
+            return
+        self._info_shown = info
+
+        status, turn, moves_count, legal_count, fen = info
+        self.info_var.set(self._INFO_TMPL.format(
+            status=status, turn=turn, moves=moves_count, legal=legal_count, fen=fen))
 
     def update_clock(self):
         """Обновление времени в статусной строке"""
-        current_time = datetime.now().strftime("%H:%M:%S")
-        self.clock_label.config(text=f"🕒 {current_time}")
-        self.root.after(1000, self.update_clock)
+        now = time.time()
+        clock_text = f"🕒 {time.strftime('%H:%M:%S', time.localtime(now))}"
+        if clock_text != self._last_clock_text:
+            self.clock_label.config(text=clock_text)
+            self._last_clock_text = clock_text
+
+        # Следующий вызов - сразу после начала следующей секунды,
+        # чтобы часы не накапливали отставание от after(1000)
+        delay_ms = int((1.0 - (now - int(now))) * 1000) + 5
+        self.root.after(delay_ms, self.update_clock)
 
     def on_time_scale(self, value):
         """Обработка изменения шкалы времени"""
@@ -699,7 +1063,7 @@ class ChessAnalyzerGUI:
         self.time_label.config(text=f"{time:.1f} сек")
         self.status_var.set(f"⏱️ Время анализа установлено: {time} сек")
 
-    def new_game(self):
+    def new_game(self, event=None):
         """Начать новую игру"""
         self.board = chess.Board()
         self.selected_square = None
@@ -726,24 +1090,19 @@ class ChessAnalyzerGUI:
         # Очищаем доску
         self.board.clear()
 
-        # Случайное количество фигур
-        pieces = ['r', 'n', 'b', 'q', 'k', 'p']
+        # Клетки выбираются разом и без повторов: два короля
+        # и от 5 до 15 случайных фигур
+        squares = random.sample(range(64), 2 + random.randint(5, 15))
+        piece_types = (chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN)
 
         # Ставим королей
-        self.board.set_piece_at(random.choice(list(chess.SQUARES)), chess.Piece.from_symbol('K'))
-        self.board.set_piece_at(random.choice(list(chess.SQUARES)), chess.Piece.from_symbol('k'))
-
-        # Добавляем несколько случайных фигур
-        for _ in range(random.randint(5, 15)):
-            piece = random.choice(pieces)
-            square = random.choice(list(chess.SQUARES))
-            if self.board.piece_at(square) is None:
-                # Чередуем цвета
-                if random.choice([True, False]):
-                    piece = piece.upper()  # Белые
-                else:
-                    piece = piece.lower()  # Черные
-                self.board.set_piece_at(square, chess.Piece.from_symbol(piece))
+        self.board.set_piece_at(squares[0], chess.Piece(chess.KING, chess.WHITE))
+        self.board.set_piece_at(squares[1], chess.Piece(chess.KING, chess.BLACK))
+
+        # Добавляем остальные фигуры случайного цвета
+        for square in squares[2:]:
+            self.board.set_piece_at(square, chess.Piece(random.choice(piece_types),
+                                                        random.choice((chess.WHITE, chess.BLACK))))
 
         # Устанавливаем чей ход
         self.board.turn = random.choice([chess.WHITE, chess.BLACK])
@@ -762,11 +1121,31 @@ class ChessAnalyzerGUI:
             self.status_var.set("⚠️ Анализ уже выполняется")
             return
 
+        if self._engine_future is not None:
+            self.status_var.set("⏳ Stockfish ещё загружается, подождите...")
+            return
+
         if not self.engine:
             self.show_error("Stockfish не загружен",
                             "Проверьте наличие stockfish.exe в папке с программой")
             return
 
+        # Позицию уже анализировали не меньшее время - показываем результат из кэша
+        cache_key = (chess.polyglot.zobrist_hash(self.board), self.level_var.get())
+        cached = self._analysis_cache.get(cache_key)
+        if cached and cached[2] >= self.analysis_time:
+            # Недавно использованные позиции вытесняются последними
+            self._analysis_cache.move_to_end(cache_key)
+            best_move, chunks, _ = cached
+            self.best_move = best_move
+            self.update_analysis_results(chunks)
+            self.progress_var.set(100)
+            self.status_var.set("✅ Анализ взят из кэша")
+            return
+
+        # Уровень мог смениться во время прошлого анализа
+        self.apply_skill_level()
+
         # Подготавливаем интерфейс
         self.is_analyzing = True
         self.analyze_button.config(state=tk.DISABLED, text="⏳ Анализ...")
@@ -776,79 +1155,169 @@ class ChessAnalyzerGUI:
         # Очищаем предыдущие результаты
         self.results_text.delete(1.0, tk.END)
         self.results_text.insert(tk.END, "Идет анализ...\n\n", "header")
-        self.results_text.update()
 
-        # Запускаем анализ в отдельном потоке
-        analysis_thread = threading.Thread(target=self.run_analysis)
-        analysis_thread.daemon = True
-        analysis_thread.start()
+        # Анализ идёт в единственном фоновом потоке движка на копии доски
+        # без истории ходов, результат забирается опросом из потока Tk
+        analysis_time = self.analysis_time
+        self._analysis_progress = 0
+        future = self._executor.submit(self.run_analysis,
+                                       self.board.copy(stack=False), analysis_time)
+        self.root.after(50, self.poll_analysis, future, cache_key, analysis_time)
 
-    def run_analysis(self):
-        """Выполнение анализа в отдельном потоке"""
-        try:
-            # Настройки анализа
-            limit = chess.engine.Limit(time=self.analysis_time)
-            skill_level = self.level_var.get()
+    def run_analysis(self, board, analysis_time):
+        """
+        Выполнение анализа в фоновом потоке
 
-            # Применяем уровень сложности
-            if hasattr(self.engine, 'configure'):
-                try:
-                    self.engine.configure({"Skill Level": skill_level})
-                except:
-                    pass
+        Не обращается к Tk: возвращает лучший ход и уже готовый текст
+        результата (см. render_analysis), которые забирает poll_analysis.
+        """
+        import chess.engine
 
-            # Получаем лучший ход (это всегда работает)
-            result = self.engine.play(self.board, limit)
-            self.best_move = result.move
+        # Настройки анализа
+        limit = chess.engine.Limit(time=analysis_time)
 
-            # Пытаемся получить оценку позиции
+        # Один поиск даёт и ход, и оценку: bestmove движка (с учётом
+        # уровня сложности) и последнюю информацию о варианте.
+        # Пока идёт поиск, по его сообщениям обновляется доля выполненного
+        # (её забирает poll_analysis)
+        analysis_error = None
+        if self._can_analyse:
             try:
-                # Пробуем получить анализ
-                analysis = self.engine.analyse(self.board, limit)
-
-                # Создаем простую структуру для отображения
-                best_move_info = {
-                    "score": analysis.get("score", chess.engine.Cp(0)),
-                    "pv": [result.move]
-                }
-
-                variations = [analysis]
+                with self.engine.analysis(board, limit) as analysis:
+                    for info in analysis:
+                        if "time" in info:
+                            self._analysis_progress = min(99, int(info["time"] / analysis_time * 100))
+                        elif "depth" in info:
+                            self._analysis_progress = min(99, info["depth"] * 5)
+                    best_move = analysis.wait().move
+                    info = dict(analysis.info)
+                self._analysis_failures = 0
+            except chess.engine.EngineTerminatedError:
+                # Процесс движка завершился - это ошибка анализа
+                # (её покажет poll_analysis), а не отсутствие поддержки
+                raise
+            except chess.engine.EngineError as e:
+                analysis_error = e
+
+        if not self._can_analyse or analysis_error is not None:
+            best_move = self.engine.play(board, limit).move
+            info = {}
+
+        if analysis_error is not None:
+            # Анализ не прошёл, а ход на той же позиции движок дал.
+            # Если так раз за разом - движок умеет только play,
+            # дальше сразу запрашиваем лучший ход
+            self._analysis_failures += 1
+            if self._analysis_failures >= ANALYSIS_FAILURE_LIMIT:
+                self._can_analyse = False
+                self._analysis_warning = (f"Движок не поддерживает анализ: {analysis_error}\n"
+                                          "Дальше показывается только лучший ход.")
+            else:
+                self._analysis_warning = (f"Анализ не удался: {analysis_error}\n"
+                                          "Показан только лучший ход.")
+
+        if best_move is None and info.get("pv"):
+            best_move = info["pv"][0]
+
+        if "score" in info:
+            # Создаем простую структуру для отображения
+            best_move_info = {
+                "score": info["score"],
+                "pv": [best_move]
+            }
+            variations = [info]
+        else:
+            best_move_info = {
+                "score": chess.engine.Cp(0),
+                "pv": [best_move]
+            }
+            variations = []
+
+        return best_move, self.render_analysis(board, variations, best_move_info, analysis_time)
+
+    def poll_analysis(self, future, cache_key, analysis_time):
+        """Проверка завершения фонового анализа (в потоке Tk)"""
+        if not future.done():
+            self.progress_var.set(self._analysis_progress)
+            self.root.after(50, self.poll_analysis, future, cache_key, analysis_time)
+            return
 
-            except Exception as analysis_error:
-                # Если анализ не сработал, используем только лучший ход
-                print(f"Анализ не удался: {analysis_error}")
-                best_move_info = {
-                    "score": chess.engine.Cp(0),
-                    "pv": [result.move]
-                }
-                variations = []
+        stale = False
+        try:
+            best_move, chunks = future.result()
 
-            # Обновляем прогресс
-            self.root.after(0, lambda: self.progress_var.set(100))
+            self.store_analysis(cache_key, (best_move, chunks, analysis_time))
 
-            # Обновляем интерфейс
-            self.root.after(0, self.update_analysis_results, variations, best_move_info)
+            # Позиция сменилась за время анализа - результат только в кэше
+            stale = cache_key[0] != chess.polyglot.zobrist_hash(self.board)
+            if stale:
+                self.results_text.delete(1.0, tk.END)
+            else:
+                self.best_move = best_move
+                self.progress_var.set(100)
+                self.update_analysis_results(chunks)
 
         except Exception as e:
-            self.root.after(0, self.show_error, "Ошибка анализа", str(e))
+            self.show_error("Ошибка анализа", str(e))
 
         finally:
             # Восстанавливаем интерфейс
-            self.root.after(0, self.analysis_finished)
+            self.analysis_finished()
+
+        if stale:
+            self.status_var.set("⚠️ Позиция изменилась во время анализа")
+
+        # Предупреждение потока движка (анализ заменён ходом play)
+        warning, self._analysis_warning = self._analysis_warning, None
+        if warning:
+            self.show_error("Ошибка анализа", warning)
+
+    def store_analysis(self, cache_key, entry):
+        """
+        Запись результата в кэш анализов (LRU)
+
+        Более долгий анализ той же позиции не заменяется более коротким.
+        Дольше всех не использованные записи вытесняются при переполнении.
+        """
+        cached = self._analysis_cache.get(cache_key)
+        if cached is None or entry[2] >= cached[2]:
+            self._analysis_cache[cache_key] = entry
+        self._analysis_cache.move_to_end(cache_key)
+
+        while len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+            self._analysis_cache.popitem(last=False)
 
-    def update_analysis_results(self, variations, best_move_info):
-        """Обновление результатов анализа"""
+    def update_analysis_results(self, chunks):
+        """Вывод готового текста результатов анализа (в потоке Tk)"""
         self.results_text.delete(1.0, tk.END)
+        self._append_results(chunks)
+        self.results_text.see(1.0)
+
+        # Позиция не менялась - на доске обновляется только подсветка
+        # лучшего хода, информационная панель остаётся прежней
+        self.draw_board()
+
+    def render_analysis(self, board, variations, best_move_info, analysis_time):
+        """
+        Текст результатов анализа позиции board в виде кусков (текст, тег)
+
+        Вызывается в потоке движка: SAN ходов и разбор оценки считаются
+        там, а потоку Tk остаётся одна вставка текста.
+        """
+        import chess.engine
 
         if not variations or (isinstance(variations, list) and len(variations) == 0):
-            self.results_text.insert(tk.END, "❌ Анализ не дал результатов\n", "bad")
-            return
+            return [("❌ Анализ не дал результатов\n", "bad")]
+
+        # Текст собирается кусками (текст, тег) и выводится одной вставкой
+        chunks = []
 
         # Заголовок
-        self.results_text.insert(tk.END, "РЕЗУЛЬТАТЫ АНАЛИЗА\n", "header")
-        self.results_text.insert(tk.END, f"Время анализа: {self.analysis_time:.1f} сек\n\n")
+        chunks.append(("РЕЗУЛЬТАТЫ АНАЛИЗА\n", "header"))
+        chunks.append((f"Время анализа: {analysis_time:.1f} сек\n\n", None))
 
         # Лучший ход
+        best_score = best_eval = None
         if best_move_info and "pv" in best_move_info and best_move_info["pv"]:
             best_move = best_move_info["pv"][0]
 
@@ -859,31 +1328,28 @@ class ChessAnalyzerGUI:
             else:
                 score = chess.engine.Cp(0)
 
-            self.results_text.insert(tk.END, "🎯 ЛУЧШИЙ ХОД: ", "header")
+            chunks.append(("🎯 ЛУЧШИЙ ХОД: ", "header"))
 
-            if hasattr(score, 'is_mate') and score.is_mate():
-                mate_in = score.mate()
+            best_score = score
+            best_eval = mate_in, cp = _white_score(score)
+            if mate_in is not None:
                 if mate_in > 0:
-                    self.results_text.insert(tk.END, f"Мат белым в {mate_in}\n", "mate")
+                    chunks.append((f"Мат белым в {mate_in}\n", "mate"))
                 else:
-                    self.results_text.insert(tk.END, f"Мат черным в {-mate_in}\n", "mate")
+                    chunks.append((f"Мат черным в {-mate_in}\n", "mate"))
             else:
-                if hasattr(score, 'white'):
-                    cp = score.white().score()
-                else:
-                    cp = score.score() if hasattr(score, 'score') else 0
                 eval_str = f"{cp / 100:.2f}"
                 if cp > 0:
-                    self.results_text.insert(tk.END, f"+{eval_str} (преимущество белых)\n", "best")
+                    chunks.append((f"+{eval_str} (преимущество белых)\n", "best"))
                 elif cp < 0:
-                    self.results_text.insert(tk.END, f"{eval_str} (преимущество черных)\n", "best")
+                    chunks.append((f"{eval_str} (преимущество черных)\n", "best"))
                 else:
-                    self.results_text.insert(tk.END, "0.00 (равно)\n", "neutral")
+                    chunks.append(("0.00 (равно)\n", "neutral"))
 
-            self.results_text.insert(tk.END, f"Ход: {self.board.san(best_move)}\n\n")
+            chunks.append((f"Ход: {board.san(best_move)}\n\n", None))
 
         # Анализ позиции
-        self.results_text.insert(tk.END, "📊 АНАЛИЗ ПОЗИЦИИ:\n", "header")
+        chunks.append(("📊 АНАЛИЗ ПОЗИЦИИ:\n", "header"))
 
         # Если у нас есть варианты, показываем их
         if variations:
@@ -891,17 +1357,16 @@ class ChessAnalyzerGUI:
                 # Берем первый (лучший) вариант
                 info = variations[0]
                 if "score" in info:
-                    score = info["score"]
+                    # Обычно это та же оценка, что у лучшего хода
+                    if info["score"] is best_score:
+                        mate_in, cp = best_eval
+                    else:
+                        mate_in, cp = _white_score(info["score"])
 
-                    if hasattr(score, 'is_mate') and score.is_mate():
-                        mate_in = score.mate()
+                    if mate_in is not None:
                         eval_text = f"Мат в {abs(mate_in)} ходов"
                         tag = "mate"
                     else:
-                        if hasattr(score, 'white'):
-                            cp = score.white().score()
-                        else:
-                            cp = score.score() if hasattr(score, 'score') else 0
                         eval_text = f"{cp / 100:+.2f}"
                         if cp > 0:
                             tag = "best"
@@ -910,53 +1375,44 @@ class ChessAnalyzerGUI:
                         else:
                             tag = "neutral"
 
-                    self.results_text.insert(tk.END, f"Оценка позиции: {eval_text}\n", tag)
+                    chunks.append((f"Оценка позиции: {eval_text}\n", tag))
 
                     # Если есть глубина анализа
                     if "depth" in info:
-                        self.results_text.insert(tk.END, f"Глубина анализа: {info['depth']} полуходов\n", "neutral")
+                        chunks.append((f"Глубина анализа: {info['depth']} полуходов\n", "neutral"))
 
                     # Если есть последовательность ходов, показываем ее
                     if "pv" in info and info["pv"]:
-                        self.results_text.insert(tk.END, "Последовательность: ", "neutral")
-                        board_copy = self.board.copy()
+                        chunks.append(("Последовательность: ", "neutral"))
+                        # История ходов копии доски не нужна; san() не проверяет
+                        # легальность сам, поэтому is_legal остаётся
+                        board_copy = board.copy(stack=False)
                         moves_displayed = []
-                        for j, move in enumerate(info["pv"]):
-                            if j >= 5:  # Ограничиваем количество ходов
-                                moves_displayed.append("...")
-                                break
-                            if board_copy.is_legal(move):
-                                moves_displayed.append(board_copy.san(move))
-                                board_copy.push(move)
-                            else:
+                        for move in info["pv"][:5]:  # Ограничиваем количество ходов
+                            if not board_copy.is_legal(move):
                                 break
-                        self.results_text.insert(tk.END, " ".join(moves_displayed) + "\n", "neutral")
+                            moves_displayed.append(board_copy.san_and_push(move))
+                        else:
+                            if len(info["pv"]) > 5:
+                                moves_displayed.append("...")
+                        chunks.append((" ".join(moves_displayed) + "\n", "neutral"))
 
         # Дополнительная информация
-        self.results_text.insert(tk.END, "\n📈 СОВЕТЫ:\n", "header")
-        self.add_analysis_tips()
+        chunks.append(("\n📈 СОВЕТЫ:\n", "header"))
+        self.add_analysis_tips(board, chunks)
+        return chunks
 
-        # Обновляем отображение доски
-        self.update_display()
+    def add_analysis_tips(self, board, chunks):
+        """Добавление советов по позиции board в список кусков результата"""
+        # Всё считается по битбордам фигур, без обхода 64 клеток
+        popcount = chess.popcount
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
 
-    def add_analysis_tips(self):
-        """Добавление советов по позиции"""
         # Анализ материального баланса
-        piece_values = {'p': 1, 'n': 3, 'b': 3, 'r': 5, 'q': 9, 'k': 0}
-
-        white_material = 0
-        black_material = 0
-
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                value = piece_values.get(piece.symbol().lower(), 0)
-                if piece.color == chess.WHITE:
-                    white_material += value
-                else:
-                    black_material += value
-
-        material_diff = white_material - black_material
+        white_counts, black_counts = piece_counts(board)
+        material_diff = (material(white_counts, _TIP_PIECE_VALUES) -
+                         material(black_counts, _TIP_PIECE_VALUES))
 
         tips = []
 
@@ -966,31 +1422,41 @@ class ChessAnalyzerGUI:
             tips.append("• Вы в материале - ищите тактические возможности")
 
         # Количество фигур
-        white_pieces = sum(1 for sq in chess.SQUARES
-                           if self.board.piece_at(sq) and self.board.piece_at(sq).color == chess.WHITE)
-        black_pieces = sum(1 for sq in chess.SQUARES
-                           if self.board.piece_at(sq) and self.board.piece_at(sq).color == chess.BLACK)
+        white_pieces = popcount(white)
+        black_pieces = popcount(black)
 
         if white_pieces <= 3 or black_pieces <= 3:
             tips.append("• Осталось мало фигур - активнее используйте короля")
 
         # Центр
-        center_squares = [chess.E4, chess.E5, chess.D4, chess.D5]
-        center_control = 0
-        for sq in center_squares:
-            piece = self.board.piece_at(sq)
-            if piece:
-                if piece.color == self.board.turn:
-                    center_control += 1
-                else:
-                    center_control -= 1
+        center_control = (popcount(_CENTER_BB & board.occupied_co[board.turn]) -
+                          popcount(_CENTER_BB & board.occupied_co[not board.turn]))
 
         if center_control < 0:
             tips.append("• Слабо контролируете центр - укрепляйте его")
 
         # Добавляем советы
         for tip in tips:
-            self.results_text.insert(tk.END, tip + "\n", "neutral")
+            chunks.append((tip + "\n", "neutral"))
+
+    def _append_results(self, chunks):
+        """
+        Вывод кусков (текст, тег) в конец результатов одной командой Tk
+
+        Text.insert принимает чередующиеся текст и теги, поэтому весь
+        результат уходит в Tk одной вставкой, а не строкой за строкой.
+        Соседние куски с одинаковым тегом склеиваются в один диапазон.
+        """
+        args = []
+        for text, tag in chunks:
+            tag = tag or ()
+            if args and args[-1] == tag:
+                args[-2] += text
+            else:
+                args.append(text)
+                args.append(tag)
+        if args:
+            self.results_text.insert(tk.END, *args)
 
     def analysis_finished(self):
         """Завершение анализа"""
@@ -1006,24 +1472,15 @@ class ChessAnalyzerGUI:
             return
 
         try:
-            # Проверяем, нужно ли превращение
-            if self.check_promotion(self.best_move):
-                # Для лучшего хода выбираем ферзя
-                promotion_move = chess.Move(
-                    from_square=self.best_move.from_square,
-                    to_square=self.best_move.to_square,
-                    promotion=chess.QUEEN
-                )
-                if promotion_move in self.board.legal_moves:
-                    self.board.push(promotion_move)
-                else:
-                    self.board.push(self.best_move)
-            else:
-                self.board.push(self.best_move)
+            # Ход движка уже содержит фигуру превращения.
+            # SAN считаем до хода: после него ход уже нелегален
+            san = self.board.san(self.best_move)
+            self.board.push(self.best_move)
 
             self.selected_square = None
+            self.best_move = None
             self.update_display()
-            self.status_var.set(f"✅ Сделан лучший ход: {self.board.san(self.best_move)}")
+            self.status_var.set(f"✅ Сделан лучший ход: {san}")
 
         except Exception as e:
             self.status_var.set(f"❌ Ошибка: {str(e)}")
@@ -1036,10 +1493,14 @@ class ChessAnalyzerGUI:
 
     def save_analysis(self):
         """Сохранение результатов анализа"""
-        if not self.results_text.get(1.0, tk.END).strip():
+        # Текст забираем из виджета один раз
+        results = self.results_text.get(1.0, tk.END)
+        if not results.strip():
             self.status_var.set("❌ Нет результатов для сохранения")
             return
 
+        from tkinter import filedialog
+
         filename = filedialog.asksaveasfilename(
             defaultextension=".txt",
             filetypes=[("Text files", "*.txt"), ("All files", "*.*")],
@@ -1048,20 +1509,28 @@ class ChessAnalyzerGUI:
 
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write("ШАХМАТНЫЙ АНАЛИЗАТЕР - РЕЗУЛЬТАТЫ АНАЛИЗА\n")
-                    f.write("=" * 50 + "\n")
-                    f.write(f"Дата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"FEN: {self.board.fen()}\n")
-                    f.write("=" * 50 + "\n\n")
-                    f.write(self.results_text.get(1.0, tk.END))
+                header = (
+                    "ШАХМАТНЫЙ АНАЛИЗАТЕР - РЕЗУЛЬТАТЫ АНАЛИЗА\n" +
+                    "=" * 50 + "\n" +
+                    f"Дата: {time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"FEN: {self.board.fen()}\n" +
+                    "=" * 50 + "\n\n"
+                )
+
+                # Двоичный режим: кодируем сами, без построчного
+                # преобразования переводов строк текстовым режимом
+                with open(filename, 'wb') as f:
+                    f.write(header.encode('utf-8'))
+                    f.write(results.encode('utf-8'))
 
                 self.status_var.set(f"✅ Анализ сохранён в {filename}")
             except Exception as e:
                 self.show_error("Ошибка сохранения", str(e))
 
-    def load_fen_dialog(self):
+    def load_fen_dialog(self, event=None):
         """Загрузка позиции из FEN строки"""
+        from tkinter import simpledialog
+
         fen = simpledialog.askstring("Загрузка FEN", "Введите FEN строку:",
                                      parent=self.root)
         if fen:
@@ -1075,8 +1544,10 @@ class ChessAnalyzerGUI:
             except Exception as e:
                 self.show_error("Ошибка FEN", f"Некорректная FEN строка:\n{str(e)}")
 
-    def save_fen_dialog(self):
+    def save_fen_dialog(self, event=None):
         """Сохранение позиции в FEN строку"""
+        from tkinter import filedialog
+
         fen = self.board.fen()
 
         filename = filedialog.asksaveasfilename(
@@ -1088,15 +1559,23 @@ class ChessAnalyzerGUI:
 
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(fen)
+                with open(filename, 'wb') as f:
+                    f.write(fen.encode('ascii'))
                 self.status_var.set(f"✅ FEN сохранён в {filename}")
             except Exception as e:
                 self.show_error("Ошибка сохранения", str(e))
 
     def show_position_stats(self):
         """Показать статистику позиции"""
-        stats_text = self.get_position_stats()
+        # Статистику той же позиции берём из кэша
+        key = self.position_key()
+        stats_text = self._stats_cache.get(key)
+        if stats_text is None:
+            stats_text = self._stats_cache[key] = self.get_position_stats()
+            while len(self._stats_cache) > STATS_CACHE_SIZE:
+                self._stats_cache.popitem(last=False)
+        else:
+            self._stats_cache.move_to_end(key)
 
         # Создаем окно со статистикой
         stats_window = tk.Toplevel(self.root)
@@ -1125,26 +1604,24 @@ class ChessAnalyzerGUI:
         stats.append(f"FEN: {self.board.fen()}")
         stats.append(f"Ход: {'белых' if self.board.turn == chess.WHITE else 'чёрных'}")
         stats.append(f"Всего ходов: {len(self.board.move_stack)}")
-        stats.append(f"Возможных ходов: {self.board.legal_moves.count()}")
-
-        # Материальный баланс
-        piece_values = {'p': 1, 'n': 3, 'b': 3.1, 'r': 5, 'q': 9, 'k': 0}
-
-        white_material = 0
-        black_material = 0
-        white_pieces = {}
-        black_pieces = {}
-
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                value = piece_values.get(piece.symbol().lower(), 0)
-                if piece.color == chess.WHITE:
-                    white_material += value
-                    white_pieces[piece.symbol().lower()] = white_pieces.get(piece.symbol().lower(), 0) + 1
-                else:
-                    black_material += value
-                    black_pieces[piece.symbol().lower()] = black_pieces.get(piece.symbol().lower(), 0) + 1
+        # Число ходов уже посчитано для информационной панели
+        legal_count = self.compute_status()[3]
+        stats.append(f"Возможных ходов: {legal_count}")
+
+        # Материальный баланс: по битборду каждого типа фигур
+        white_counts, black_counts = piece_counts(self.board)
+        white_material = material(white_counts, _STATS_PIECE_VALUES)
+        black_material = material(black_counts, _STATS_PIECE_VALUES)
+
+        # Фигуры перечисляются в порядке обхода доски с a1:
+        # тип идёт по первой (младшей) клетке, на которой он стоит
+        def listing(counts, color):
+            present = [(chess.lsb(self.board.pieces_mask(piece_type, color)), piece_type, count)
+                       for piece_type, count in zip(chess.PIECE_TYPES, counts) if count]
+            return {chess.piece_symbol(piece_type): count for _, piece_type, count in sorted(present)}
+
+        white_pieces = listing(white_counts, chess.WHITE)
+        black_pieces = listing(black_counts, chess.BLACK)
 
         stats.append("\nМАТЕРИАЛЬНЫЙ БАЛАНС:")
         stats.append(f"  Белые: {white_material:.1f}")
@@ -1160,10 +1637,10 @@ class ChessAnalyzerGUI:
 
         # Специальные правила
         stats.append("\nСПЕЦИАЛЬНЫЕ ПРАВИЛА:")
-        stats.append(f"  Рокировка (белые): {'K' if self.board.castling_rights & chess.BB_H1 else ''}"
-                     f"{'Q' if self.board.castling_rights & chess.BB_A1 else ''}")
-        stats.append(f"  Рокировка (чёрные): {'k' if self.board.castling_rights & chess.BB_H8 else ''}"
-                     f"{'q' if self.board.castling_rights & chess.BB_A8 else ''}")
+        # Права на рокировку - биты ладейных углов: h1 (7), a1 (0), h8 (63), a8 (56)
+        rights = self.board.castling_rights
+        stats.append(f"  Рокировка (белые): {_CASTLING_WHITE[(rights >> 7) & 1 | (rights & 1) << 1]}")
+        stats.append(f"  Рокировка (чёрные): {_CASTLING_BLACK[(rights >> 63) & 1 | ((rights >> 56) & 1) << 1]}")
 
         if self.board.ep_square:
             stats.append(f"  Взятие на проходе возможно на: {chess.square_name(self.board.ep_square)}")
@@ -1171,15 +1648,18 @@ class ChessAnalyzerGUI:
         stats.append(f"  Правило 50 ходов: {self.board.halfmove_clock}/50")
 
         # Статус игры
+        # Мат и пат определяем по уже известному числу ходов,
+        # без повторной генерации ходов
         stats.append("\nСТАТУС ИГРЫ:")
-        if self.board.is_checkmate():
+        in_check = self.board.is_check()
+        if legal_count == 0 and in_check:
             stats.append("  ШАХ И МАТ!")
             stats.append(f"  Победили: {'чёрные' if self.board.turn == chess.WHITE else 'белые'}")
-        elif self.board.is_stalemate():
+        elif legal_count == 0:
             stats.append("  ПАТ - ничья")
         elif self.board.is_insufficient_material():
             stats.append("  НЕДОСТАТОК МАТЕРИАЛА - ничья")
-        elif self.board.is_check():
+        elif in_check:
             stats.append("  ШАХ")
         else:
             stats.append("  Игра продолжается")
@@ -1251,17 +1731,49 @@ class ChessAnalyzerGUI:
 
     def on_closing(self):
         """Обработка закрытия окна"""
+        self._executor.shutdown(wait=False)
+
+        # Движок, который ещё загружается, закрываем сразу после запуска
+        if self._engine_future is not None:
+            self._engine_future.add_done_callback(self.quit_loaded_engine)
+
         if self.engine:
             try:
                 self.engine.quit()
-            except:
-                pass
+            except Exception:
+                pass  # Процесс движка или его цикл событий уже завершились
         self.root.destroy()
 
+    @staticmethod
+    def quit_loaded_engine(future):
+        """Закрытие движка, загрузка которого завершилась после выхода"""
+        if not future.cancelled() and future.exception() is None:
+            engine, _ = future.result()
+            engine.quit()
 
-# Запуск приложения
-if __name__ == "__main__":
+
+def _warm_up_imports():
+    """
+    Фоновый импорт chess.engine, пока строится окно
+
+    Tkinter отпускает GIL во время вызовов Tcl, поэтому импорт идёт
+    параллельно с созданием виджетов, и open_engine получает уже
+    загруженный модуль.
+    """
+    threading.Thread(target=importlib.import_module, args=("chess.engine",),
+                     daemon=True).start()
+
+
+def main():
+    """Запуск приложения"""
+    _warm_up_imports()
+    _import_tk()
     root = tk.Tk()
     app = ChessAnalyzerGUI(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+
+# Запуск приложения
+if __name__ == "__main__":
+    main()
@@ -5,15 +5,238 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, simpledialog
+import bisect
 import chess
 import chess.engine
+import chess.polyglot
 import os
+import queue
+import random
+import sys
 import threading
 import time
+from collections import OrderedDict
 from datetime import datetime
 
+# Сколько проанализированных позиций хранить в кэше
+ANALYSIS_CACHE_SIZE = 512
+
+# Размеры хэш-таблицы Stockfish (МБ) для выбора в интерфейсе
+ENGINE_HASH_SIZES = (16, 32, 64, 128, 256, 512, 1024, 2048)
+
+# Поля сообщений движка, которые разбирает python-chess: глубина, узлы
+# и время (INFO_BASIC), оценка и вариант. Остальное (currmove, hashfull,
+# refutation, ...) в результатах не выводится
+ANALYSIS_INFO = chess.engine.INFO_BASIC | chess.engine.INFO_SCORE | chess.engine.INFO_PV
+
+# Теги оформления поля результатов и их стиль: (шрифт, цвет)
+TAG_HEADER = "header"
+TAG_BEST = "best"
+TAG_GOOD = "good"
+TAG_NEUTRAL = "neutral"
+TAG_BAD = "bad"
+TAG_MATE = "mate"
+RESULT_TAG_STYLES = {
+    TAG_HEADER: (("Consolas", 10, "bold"), "#FFD700"),
+    TAG_BEST: (("Consolas", 9, "bold"), "#32CD32"),
+    TAG_GOOD: (("Consolas", 9), "#90EE90"),
+    TAG_NEUTRAL: (("Consolas", 9), "#FFFFFF"),
+    TAG_BAD: (("Consolas", 9), "#FF6B6B"),
+    TAG_MATE: (("Consolas", 9, "bold"), "#FF4500"),
+}
+
+# Линии-разделители: строка из "=" или "-" однопиксельным шрифтом
+# цвета фона - в поле это тонкая полоса во всю ширину, а в сохранённом
+# анализе (текст поля) остаётся обычной текстовой линией
+TAG_SEP_MAJOR = "sep_major"
+TAG_SEP_MINOR = "sep_minor"
+SEPARATOR_TAG_COLORS = {
+    TAG_SEP_MAJOR: "#FFD700",
+    TAG_SEP_MINOR: "#555555",
+}
+
+# Оценка позиции в пешках: пороги по возрастанию и (тег, комментарий)
+# для каждого промежутка. Порог относится к нижнему промежутку,
+# поэтому индекс ищется через bisect_left
+_EVAL_THRESHOLDS = (-3.0, -1.0, -0.5, -0.2, 0.2, 0.5, 1.0, 3.0)
+_EVAL_LABELS = (
+    (TAG_BAD, "🏆 РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"),
+    (TAG_BAD, "⭐ БОЛЬШОЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"),
+    (TAG_BAD, "↓ ПРЕИМУЩЕСТВО ЧЁРНЫХ"),
+    (TAG_BAD, "↘ НЕБОЛЬШОЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"),
+    (TAG_NEUTRAL, "↔ РАВНАЯ ПОЗИЦИЯ"),
+    (TAG_GOOD, "↗ НЕБОЛЬШОЕ ПРЕИМУЩЕСТВО БЕЛЫХ"),
+    (TAG_GOOD, "↑ ПРЕИМУЩЕСТВО БЕЛЫХ"),
+    (TAG_BEST, "⭐ БОЛЬШОЕ ПРЕИМУЩЕСТВО БЕЛЫХ"),
+    (TAG_BEST, "🏆 РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО БЕЛЫХ"),
+)
+
+# То же для оценки варианта, кроме первого (он всегда TAG_BEST)
+_VARIANT_THRESHOLDS = (-0.3, 0.3)
+_VARIANT_TAGS = (TAG_BAD, TAG_NEUTRAL, TAG_GOOD)
+
+# Разделители: заголовка (и шапки сохранённого файла) и блока вариантов
+_HEADER_BAR = "=" * 70 + "\n"
+_SECTION_RULE = "-" * 70 + "\n"
+
+# Заголовок результатов анализа: куски (текст, тег)
+_RESULTS_TITLE = (
+    (_HEADER_BAR, TAG_SEP_MAJOR),
+    ("🎯 РЕЗУЛЬТАТЫ АНАЛИЗА\n", TAG_HEADER),
+    (_HEADER_BAR, TAG_SEP_MAJOR),
+    ("\n", None),
+)
+
+# Приветствие в поле результатов
+_WELCOME_TEXT = """Добро пожаловать в ШАХМАТНЫЙ АНАЛИЗАТОР!
+
+Для начала анализа:
+1. Установите параметры анализа справа
+2. Нажмите кнопку "НАЧАТЬ АНАЛИЗ"
+3. Дождитесь результатов
+
+Возможности программы:
+• Анализ любой шахматной позиции
+• Несколько вариантов продолжения
+• Оценка позиции в пешках
+• Рекомендации по лучшим ходам
+• Подсветка ходов на доске
+• Сохранение и загрузка позиций
+
+Удачи в анализе! 🏆
+"""
+
+# Текст окна "Инструкция"
+_INSTRUCTIONS = """=== ШАХМАТНЫЙ АНАЛИЗАТОР - ИНСТРУКЦИЯ ===
+
+🎯 ОСНОВНЫЕ ВОЗМОЖНОСТИ:
+
+1. АНАЛИЗ ПОЗИЦИЙ:
+   • Загрузка любой позиции (FEN или новая игра)
+   • Анализ движком Stockfish
+   • Несколько вариантов продолжения
+   • Оценка позиции в пешках или матовые варианты
+
+2. УПРАВЛЕНИЕ ДОСКОЙ:
+   • Кликните по фигуре, затем по клетке для хода
+   • Кнопки "Отменить ход" и "Новая игра"
+   • Случайные позиции для тренировки
+
+3. НАСТРОЙКИ АНАЛИЗА:
+   • Время анализа: 0.5 - 30 секунд
+   • Уровень сложности: 0 (новичок) - 20 (гроссмейстер)
+   • Количество вариантов: 1-10
+
+4. РАБОТА С ФАЙЛАМИ:
+   • Сохранение/загрузка позиций (FEN)
+   • Сохранение результатов анализа
+   • Экспорт в текстовый файл
+
+📊 КАК ЧИТАТЬ РЕЗУЛЬТАТЫ:
+
+• +1.50 = преимущество белых в 1.5 пешки
+• Мат в 3 = мат через 3 хода
+• Зелёный текст = лучшие ходы
+• Красный текст = плохие ходы
+• Стрелки на доске показывают рекомендуемые ходы
+
+💡 СОВЕТЫ:
+
+• Для тренировки используйте уровень 5-10
+• Для глубокого анализа - 20+ секунд и уровень 20
+• Сохраняйте интересные позиции для дальнейшего изучения
+• Используйте случайные позиции для разнообразия
+
+⚠️ ТРЕБОВАНИЯ:
+
+• Stockfish.exe в папке с программой
+• Python 3.6 или новее
+• Библиотеки: python-chess, tkinter
+
+📞 ПОДДЕРЖКА:
+
+Программа разработана для учебного проекта.
+Все вопросы и предложения приветствуются!
+"""
+
+# Текст окна "О программе"
+_ABOUT_TEXT = """=== ШАХМАТНЫЙ АНАЛИЗАТОР v2.0 ===
+
+🎮 ПРОГРАММА ДЛЯ АНАЛИЗА ШАХМАТНЫХ ПОЗИЦИЙ
+
+ОСНОВНЫЕ ФУНКЦИИ:
+• Анализ позиций движком Stockfish
+• Графический интерфейс с шахматной доской
+• Подробные рекомендации и варианты
+• Сохранение и загрузка позиций
+• Подсветка рекомендуемых ходов
+
+ТЕХНОЛОГИИ:
+• Python 3
+• Stockfish 16 (сильнейший шахматный движок)
+• Библиотека python-chess
+• Графический интерфейс Tkinter
+
+ВОЗМОЖНОСТИ АНАЛИЗА:
+• Оценка позиции в пешках
+• Поиск матовых комбинаций
+• Несколько вариантов продолжения
+• Статистика позиции
+• Рекомендации на русском языке
+
+ДЛЯ КОГО ЭТА ПРОГРАММА:
+• Шахматистов-любителей для анализа партий
+• Тренеров для подготовки учеников
+• Студентов для изучения алгоритмов
+• Всех, кто хочет улучшить свою игру
+
+🌟 ОСОБЕННОСТИ:
+• Простой и понятный интерфейс
+• Быстрый и глубокий анализ
+• Подробные объяснения
+• Работа без интернета
+
+АВТОР: Разработано для учебного проекта по
+компьютерному зрению и искусственному интеллекту.
+
+ВЕРСИЯ: 2.0 (Январь 2024)
+
+📧 Контакт: Для вопросов и предложений
+"""
+
+# Центральные клетки d4, e4, d5, e5
+_CENTER_SQUARES = (chess.D4, chess.E4, chess.D5, chess.E5)
+
+
+def center_control(board):
+    """
+    Перевес белых в числе атак на центральные клетки
+
+    Считается по битовым маскам атакующих фигур, без построения
+    SquareSet для каждой клетки. Не зависит от интерфейса.
+    """
+    popcount = chess.popcount
+    attackers_mask = board.attackers_mask
+    return sum(popcount(attackers_mask(chess.WHITE, square)) - popcount(attackers_mask(chess.BLACK, square))
+               for square in _CENTER_SQUARES)
+
 
 class ChessAnalyzerGUI:
+    # Шрифт фигур на доске
+    _FONT_PIECE = ("Segoe UI Symbol", 32)
+
+    # Файлы того же шрифта для картинок фигур: Segoe UI Symbol в Windows,
+    # в Linux - DejaVu Sans с теми же шахматными символами
+    _SPRITE_FONT_FILES = ("seguisym.ttf", "DejaVuSans.ttf")
+
+    # Готовые фигуры для случайной позиции: короли и остальные фигуры обоих цветов
+    _WHITE_KING = chess.Piece(chess.KING, chess.WHITE)
+    _BLACK_KING = chess.Piece(chess.KING, chess.BLACK)
+    _RANDOM_PIECES = tuple(chess.Piece(piece_type, color)
+                           for color in chess.COLORS
+                           for piece_type in (chess.PAWN, chess.KNIGHT, chess.BISHOP,
+                                              chess.ROOK, chess.QUEEN))
+
     def __init__(self, root):
         self.root = root
         self.root.title("ШАХМАТНЫЙ АНАЛИЗАТОР v2.0")
@@ -31,6 +254,29 @@ class ChessAnalyzerGUI:
         self.selected_square = None
         self.best_move = None
 
+        # Сообщения потока анализа для потока Tk (см. _drain_results)
+        # и последние варианты движка по номеру варианта
+        self._result_queue = queue.Queue()
+        self._latest_pv = {}
+
+        # Кэш анализа: (хэш Зобриста позиции, время, число вариантов,
+        # уровень) -> варианты движка; ключ текущего анализа
+        self._analysis_cache = OrderedDict()
+        self._analysis_key = None
+
+        # Уровень, с которым получены выводимые результаты: display_results
+        # вызывается много раз за анализ и не читает переменную Tk заново
+        self._analysis_level = None
+
+        # Номер партии для движка: python-chess посылает ucinewgame (и движок
+        # очищает хэш-таблицу), только когда номер меняется. Ходы и отмены
+        # ходов одной партии анализируются с уже накопленным хэшем
+        self._game_id = 0
+
+        # UCI-настройки, уже переданные движку (см. apply_engine_options
+        # и run_analysis)
+        self._engine_options = {}
+
         # Unicode символы для фигур
         self.piece_symbols = {
             'r': '♜', 'n': '♞', 'b': '♝', 'q': '♛', 'k': '♚', 'p': '♟',
@@ -43,6 +289,15 @@ class ChessAnalyzerGUI:
             'R': 'Ладья', 'N': 'Конь', 'B': 'Слон', 'Q': 'Ферзь', 'K': 'Король', 'P': 'Пешка'
         }
 
+        # Отрисовка фигуры (символ, цвет, цвет тени) по индексу
+        # piece_type для белых и piece_type + 6 для чёрных
+        self._piece_render = [None] * 13
+        for piece_type in chess.PIECE_TYPES:
+            for color, offset, fill, shadow in ((chess.WHITE, 0, "white", "gray"),
+                                                 (chess.BLACK, 6, "black", "#333")):
+                letter = chess.Piece(piece_type, color).symbol()
+                self._piece_render[piece_type + offset] = (self.piece_symbols[letter], fill, shadow)
+
         # Цвета интерфейса
         self.colors = {
             "board_light": "#f0d9b5",
@@ -63,15 +318,20 @@ class ChessAnalyzerGUI:
         # Создаём интерфейс
         self.create_widgets()
 
-        # Загружаем движок Stockfish
-        self.load_engine()
-
         # Обновляем отображение
+        self._refresh_legal_cache()
         self.update_display()
 
         # Запускаем обновление времени
+        self._last_clock_text = None
         self.update_clock()
 
+        # Загружаем движок Stockfish в фоне, когда окно уже показано
+        self._engine_thread = None
+        self._engine_load_result = None
+        self._closing = False
+        self.root.after(0, self.load_engine)
+
     def center_window(self):
         """Центрирование окна на экране"""
         self.root.update_idletasks()
@@ -144,6 +404,14 @@ class ChessAnalyzerGUI:
         analysis_menu.add_command(label="📊 Показать статистику позиции",
                                   command=self.show_position_stats)
 
+        # Меню "Вид"
+        self.shadows_var = tk.BooleanVar(value=True)
+        self._render_shadows = True
+        view_menu = tk.Menu(menubar, tearoff=0)
+        menubar.add_cascade(label="👁️ Вид", menu=view_menu)
+        view_menu.add_checkbutton(label="✨ Фигуры с тенью", variable=self.shadows_var,
+                                  command=self.toggle_shadows)
+
         # Меню "Помощь"
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="❓ Помощь", menu=help_menu)
@@ -176,6 +444,12 @@ class ChessAnalyzerGUI:
         self.board_canvas.grid(row=0, column=0, pady=(0, 15))
         self.board_canvas.bind("<Button-1>", self.on_board_click)
 
+        # Нарисованные фигуры: клетка -> (id тени, если есть, id фигуры) и сама фигура
+        self._piece_items = {}
+        self._last_pieces = {}
+        self._piece_sprites = self.load_piece_sprites()
+        self.init_static_board()
+
         # Панель управления доской
         board_controls = ttk.Frame(left_panel)
         board_controls.grid(row=1, column=0, sticky=(tk.W, tk.E))
@@ -194,12 +468,25 @@ class ChessAnalyzerGUI:
         info_frame = ttk.LabelFrame(left_panel, text="ИНФОРМАЦИЯ О ПОЗИЦИИ", padding="10")
         info_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
 
-        # Текстовая информация
-        info_text = tk.Text(info_frame, height=8, width=45, font=("Consolas", 9),
-                            bg=self.colors["bg_dark"], fg=self.colors["text_light"],
-                            relief=tk.FLAT, borderwidth=0)
-        info_text.pack()
-        self.info_text = info_text
+        # Строки информации: подпись и значение в своей переменной,
+        # так Tk перерисовывает только изменившиеся строки
+        info_panel = tk.Frame(info_frame, bg=self.colors["bg_dark"], padx=8, pady=6)
+        info_panel.pack(fill=tk.X)
+
+        self._info_vars = []  # Статус, чей ход, ходов, возможных ходов, FEN
+        self._info_shown = (None,) * 5
+        for row, caption in enumerate(("Статус:", "Ход:", "Всего ходов:",
+                                       "Возможных ходов:", "FEN:")):
+            tk.Label(info_panel, text=caption, font=("Consolas", 9, "bold"),
+                     bg=self.colors["bg_dark"], fg=self.colors["text_light"],
+                     anchor=tk.W).grid(row=row, column=0, sticky=(tk.W, tk.N))
+
+            var = tk.StringVar()
+            tk.Label(info_panel, textvariable=var, font=("Consolas", 9),
+                     bg=self.colors["bg_dark"], fg=self.colors["text_light"],
+                     anchor=tk.W, justify=tk.LEFT,
+                     wraplength=280).grid(row=row, column=1, sticky=tk.W, padx=(8, 0))
+            self._info_vars.append(var)
 
         # ===== ПРАВАЯ ПАНЕЛЬ - АНАЛИЗ =====
         right_panel = ttk.Frame(main_container)
@@ -256,14 +543,36 @@ class ChessAnalyzerGUI:
         multipv_combo.pack(side=tk.LEFT, padx=10)
         multipv_combo.set(3)
 
+        # Ресурсы движка: потоки и хэш-таблица
+        engine_frame = ttk.Frame(settings_frame)
+        engine_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 15))
+
+        ttk.Label(engine_frame, text="⚙️ Потоков:",
+                  font=("Arial", 10, "bold")).pack(side=tk.LEFT)
+
+        cpu_count = os.cpu_count() or 1
+        self.threads_var = tk.IntVar(value=max(1, cpu_count - 1))
+        ttk.Spinbox(engine_frame, textvariable=self.threads_var,
+                    from_=1, to=cpu_count, width=4, state="readonly",
+                    command=self.apply_engine_options).pack(side=tk.LEFT, padx=10)
+
+        ttk.Label(engine_frame, text="Хэш (МБ):",
+                  font=("Arial", 10, "bold")).pack(side=tk.LEFT)
+
+        self.hash_var = tk.IntVar(value=512)
+        ttk.Spinbox(engine_frame, textvariable=self.hash_var,
+                    values=ENGINE_HASH_SIZES, width=6, state="readonly",
+                    command=self.apply_engine_options).pack(side=tk.LEFT, padx=10)
+
         # Кнопка анализа
         self.analyze_button = ttk.Button(settings_frame, text="🚀 НАЧАТЬ АНАЛИЗ",
                                          command=self.start_analysis,
                                          style="Accent.TButton", width=25)
-        self.analyze_button.grid(row=3, column=0, columnspan=3, pady=(5, 0))
+        self.analyze_button.grid(row=4, column=0, columnspan=3, pady=(5, 0))
 
         # Прогресс-бар
         self.progress_var = tk.DoubleVar()
+        self._progress_shown = 0
         self.progress_bar = ttk.Progressbar(right_panel, variable=self.progress_var,
                                             maximum=100, length=400)
         self.progress_bar.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(10, 5))
@@ -292,12 +601,11 @@ class ChessAnalyzerGUI:
         self.results_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
         # Добавляем теги для форматирования
-        self.results_text.tag_configure("header", font=("Consolas", 10, "bold"), foreground="#FFD700")
-        self.results_text.tag_configure("best", font=("Consolas", 9, "bold"), foreground="#32CD32")
-        self.results_text.tag_configure("good", font=("Consolas", 9), foreground="#90EE90")
-        self.results_text.tag_configure("neutral", font=("Consolas", 9), foreground="#FFFFFF")
-        self.results_text.tag_configure("bad", font=("Consolas", 9), foreground="#FF6B6B")
-        self.results_text.tag_configure("mate", font=("Consolas", 9, "bold"), foreground="#FF4500")
+        for tag, (font, color) in RESULT_TAG_STYLES.items():
+            self.results_text.tag_configure(tag, font=font, foreground=color)
+        for tag, color in SEPARATOR_TAG_COLORS.items():
+            self.results_text.tag_configure(tag, font=("Consolas", 1),
+                                            foreground=color, background=color)
 
         # Панель действий
         action_frame = ttk.Frame(right_panel)
@@ -332,23 +640,99 @@ class ChessAnalyzerGUI:
             self.engine = None
             return
 
+        # Запуск процесса и рукопожатие UCI - в отдельном потоке,
+        # пока движок не готов, анализ недоступен
+        self.analyze_button.config(state=tk.DISABLED)
+        self._engine_load_result = None
+        self._engine_thread = threading.Thread(target=self._load_engine_bg, daemon=True)
+        self._engine_thread.start()
+        self.root.after(100, self._poll_engine_load)
+
+    def _load_engine_bg(self):
+        """Запуск процесса движка (в фоновом потоке, без Tk)"""
         try:
-            self.engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
-            self.status_var.set(f"✅ Stockfish загружен: {self.engine.id['name']}")
+            engine = chess.engine.SimpleEngine.popen_uci(self.engine_path)
         except Exception as e:
-            self.show_error("Ошибка загрузки Stockfish", str(e))
+            self._engine_load_result = (None, str(e))
+            return
+
+        self._engine_load_result = (engine, None)
+
+        # Окно закрыли, пока движок запускался
+        if self._closing:
+            try:
+                engine.quit()
+            except chess.engine.EngineError:
+                pass
+
+    def _poll_engine_load(self):
+        """Проверка завершения запуска движка (в потоке Tk)"""
+        if self._engine_thread.is_alive():
+            self.root.after(100, self._poll_engine_load)
+            return
+
+        self._engine_thread = None
+        self.analyze_button.config(state=tk.NORMAL)
+
+        engine, error = self._engine_load_result
+        if engine is None:
+            self.show_error("Ошибка загрузки Stockfish", error)
             self.engine = None
+            return
+
+        self.engine = engine
+        self._engine_options = {}
+        self.apply_engine_options()
+        self.status_var.set(f"✅ Stockfish загружен: {self.engine.id['name']}")
+
+    def apply_engine_options(self):
+        """
+        Передача движку числа потоков и размера хэша, если они изменились
+
+        Во время анализа настройки не отправляем: они применятся
+        сразу после его окончания.
+        """
+        if not self.engine or self.is_analyzing:
+            return
+
+        options = {"Threads": self.threads_var.get(), "Hash": self.hash_var.get()}
+        changed = {name: value for name, value in options.items()
+                   if name in self.engine.options and self._engine_options.get(name) != value}
+        if changed:
+            self.engine.configure(changed)
+            self._engine_options.update(changed)
+
+    def _refresh_legal_cache(self):
+        """
+        Сбор легальных ходов позиции: клетка откуда -> {клетка куда: ход}
+
+        Вызывается после каждого изменения доски. Из ходов с превращением
+        на одну клетку остаётся первый сгенерированный - в ферзя.
+        Заодно сбрасывает FEN позиции (см. current_fen) и записи
+        ходов вариантов (см. _pv_sans).
+        """
+        self._fen_cache = None
+        self._san_cache = {}
+        self._legal_targets = {}
+        self._legal_count = 0
+        for move in self.board.legal_moves:
+            self._legal_targets.setdefault(move.from_square, {}).setdefault(move.to_square, move)
+            self._legal_count += 1
+
+    def current_fen(self):
+        """FEN текущей позиции, строится один раз до следующего изменения доски"""
+        if self._fen_cache is None:
+            self._fen_cache = self.board.fen()
+        return self._fen_cache
 
     def update_display(self):
         """Обновление всего отображения"""
         self.draw_board()
         self.update_info_text()
 
-    def draw_board(self):
-        """Отрисовка шахматной доски"""
-        self.board_canvas.delete("all")
-
-        cell_size = 60  # Увеличили размер клетки
+    def init_static_board(self):
+        """Однократная отрисовка клеток и координат доски"""
+        cell_size = 60
         board_size = cell_size * 8
 
         # Рисуем шахматную доску
@@ -392,41 +776,27 @@ class ChessAnalyzerGUI:
                 fill="black"
             )
 
-        # Рисуем фигуры
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                row = 7 - (square // 8)  # Инвертируем строки
-                col = square % 8
+    def draw_board(self):
+        """
+        Отрисовка шахматной доски
 
-                x = col * cell_size + cell_size // 2
-                y = row * cell_size + cell_size // 2
+        Клетки и координаты нарисованы один раз в init_static_board,
+        здесь обновляются только клетки, где фигура изменилась
+        с прошлой отрисовки. Подсветка и стрелка рисуются заново.
+        """
+        # Убираем подсветку прошлой отрисовки
+        self.board_canvas.delete("overlay")
 
-                symbol = self.piece_symbols.get(piece.symbol(), piece.symbol())
+        pieces = self.board.piece_map()
 
-                # Цвет фигуры
-                if piece.color == chess.WHITE:
-                    fill_color = "white"
-                    shadow_color = "gray"
-                else:
-                    fill_color = "black"
-                    shadow_color = "#333"
+        # Убираем фигуры с освободившихся клеток
+        for square in self._last_pieces.keys() - pieces.keys():
+            self._clear_piece_at(square)
 
-                # Рисуем тень (для объёма)
-                self.board_canvas.create_text(
-                    x + 1, y + 1,
-                    text=symbol,
-                    font=("Segoe UI Symbol", 32),
-                    fill=shadow_color
-                )
-
-                # Рисуем фигуру
-                self.board_canvas.create_text(
-                    x, y,
-                    text=symbol,
-                    font=("Segoe UI Symbol", 32),
-                    fill=fill_color
-                )
+        # Рисуем фигуры
+        for square, piece in pieces.items():
+            if piece != self._last_pieces.get(square):
+                self._render_piece_at(square, piece)
 
         # Подсвечиваем выбранную клетку
         if self.selected_square is not None:
@@ -436,6 +806,148 @@ class ChessAnalyzerGUI:
         if self.best_move:
             self.highlight_move(self.best_move)
 
+    def _render_piece_at(self, square, piece):
+        """Отрисовка фигуры piece на клетке square (взамен прежней, если была)"""
+        cell_size = 60
+        index = piece.piece_type + (0 if piece.color else 6)
+        symbol, fill_color, shadow_color = self._piece_render[index]
+
+        items = self._piece_items.get(square)
+
+        if self._piece_sprites:
+            # Фигура - одна готовая картинка
+            if items:
+                self.board_canvas.itemconfigure(items[0], image=self._piece_sprites[index])
+            else:
+                self._piece_items[square] = (self.board_canvas.create_image(
+                    (square % 8) * cell_size + cell_size // 2,
+                    (7 - square // 8) * cell_size + cell_size // 2,
+                    image=self._piece_sprites[index]
+                ),)
+            self._last_pieces[square] = piece
+            return
+
+        if items:
+            # Меняем уже нарисованную фигуру (и тень, если она есть)
+            if len(items) == 2:
+                self.board_canvas.itemconfigure(items[0], text=symbol, fill=shadow_color)
+            self.board_canvas.itemconfigure(items[-1], text=symbol, fill=fill_color)
+        else:
+            row = 7 - (square // 8)  # Инвертируем строки
+            col = square % 8
+
+            x = col * cell_size + cell_size // 2
+            y = row * cell_size + cell_size // 2
+
+            items = ()
+            if self._render_shadows:
+                # Рисуем тень (для объёма)
+                items = (self.board_canvas.create_text(
+                    x + 1, y + 1,
+                    text=symbol,
+                    font=self._FONT_PIECE,
+                    fill=shadow_color
+                ),)
+
+            # Рисуем фигуру
+            piece_id = self.board_canvas.create_text(
+                x, y,
+                text=symbol,
+                font=self._FONT_PIECE,
+                fill=fill_color
+            )
+            self._piece_items[square] = items + (piece_id,)
+
+        self._last_pieces[square] = piece
+
+    def toggle_shadows(self):
+        """Включение и выключение теней фигур: все фигуры рисуются заново"""
+        self._render_shadows = self.shadows_var.get()
+        self._piece_sprites = self.load_piece_sprites()
+        for items in self._piece_items.values():
+            self.board_canvas.delete(*items)
+        self._piece_items.clear()
+        self._last_pieces.clear()
+        self.draw_board()
+
+    def load_piece_sprites(self):
+        """
+        Картинки фигур для канваса: список по индексам _piece_render
+
+        Символ, цвета и тень (если включена в меню "Вид") те же, что у
+        текстовых фигур в _render_piece_at, но растеризуются один раз -
+        при запуске и при переключении теней. None, если Pillow или
+        шрифт не найдены: тогда фигуры рисуются текстом.
+        """
+        try:
+            from PIL import Image, ImageDraw, ImageTk
+        except ImportError:
+            return None
+
+        font = self._sprite_font()
+        if font is None:
+            return None
+
+        def render(symbol, fill_color, shadow_color):
+            image = Image.new("RGBA", (60, 60))  # прозрачный фон
+            draw = ImageDraw.Draw(image)
+            if self._render_shadows:
+                draw.text((31, 31), symbol, font=font, fill=shadow_color, anchor="mm")
+            draw.text((30, 30), symbol, font=font, fill=fill_color, anchor="mm")
+            return ImageTk.PhotoImage(image, master=self.root)
+
+        return [render(*entry) if entry else None for entry in self._piece_render]
+
+    def _sprite_font(self):
+        """Шрифт Pillow размера _FONT_PIECE (первый найденный из _SPRITE_FONT_FILES) или None"""
+        from PIL import ImageFont
+
+        # Размер _FONT_PIECE - в пунктах, Pillow принимает пиксели (96 dpi)
+        size = round(self._FONT_PIECE[1] * 96 / 72)
+        for font_file in self._SPRITE_FONT_FILES:
+            try:
+                return ImageFont.truetype(font_file, size)
+            except OSError:
+                pass
+        return None
+
+    def _clear_piece_at(self, square):
+        """Удаление фигуры с клетки square"""
+        items = self._piece_items.pop(square, None)
+        if items:
+            self.board_canvas.delete(*items)
+            del self._last_pieces[square]
+
+    def _apply_move_visual(self, move):
+        """
+        Перерисовка только клеток, затронутых сделанным ходом move
+
+        Вызывается после push: кроме клеток откуда/куда сверяются клетка
+        пешки, взятой на проходе, и клетки ладьи при рокировке.
+        """
+        board = self.board
+        squares = [move.from_square, move.to_square]
+        from_rank = chess.square_rank(move.from_square)
+        to_file = chess.square_file(move.to_square)
+        moved = board.piece_type_at(move.to_square)
+
+        if moved == chess.PAWN and chess.square_file(move.from_square) != to_file:
+            # Взятие: при взятии на проходе пешка стояла рядом, а не на to_square
+            squares.append(chess.square(to_file, from_rank))
+        elif moved == chess.KING and abs(chess.square_file(move.from_square) - to_file) == 2:
+            # Рокировка: ладья переходит с крайней вертикали к королю
+            if to_file == 6:
+                squares += (chess.square(7, from_rank), chess.square(5, from_rank))
+            else:
+                squares += (chess.square(0, from_rank), chess.square(3, from_rank))
+
+        for square in squares:
+            piece = board.piece_at(square)
+            if piece is None:
+                self._clear_piece_at(square)
+            elif piece != self._last_pieces.get(square):
+                self._render_piece_at(square, piece)
+
     def highlight_square(self, square, color):
         """Подсветка клетки на доске"""
         row = 7 - (square // 8)
@@ -448,7 +960,8 @@ class ChessAnalyzerGUI:
         y2 = y1 + cell_size - 4
 
         self.board_canvas.create_rectangle(x1, y1, x2, y2,
-                                           outline=color, width=3)
+                                           outline=color, width=3,
+                                           tags="overlay")
 
     def highlight_move(self, move):
         """Подсветка хода на доске"""
@@ -479,7 +992,8 @@ class ChessAnalyzerGUI:
         self.board_canvas.create_line(x1, y1, x2, y2,
                                       fill=self.colors["best_move"],
                                       width=2, arrow=tk.LAST,
-                                      arrowshape=(10, 12, 6))
+                                      arrowshape=(10, 12, 6),
+                                      tags="overlay")
 
     def on_board_click(self, event):
         """Обработка клика по шахматной доске"""
@@ -502,15 +1016,22 @@ class ChessAnalyzerGUI:
             else:
                 # Пытаемся сделать ход
                 try:
-                    move = chess.Move(self.selected_square, square)
+                    # Ход ищем среди заранее собранных легальных ходов
+                    move = self._legal_targets.get(self.selected_square, {}).get(square)
 
-                    # Проверяем, правильный ли это ход
-                    if move in self.board.legal_moves:
+                    if move is not None:
+                        # Запись хода берём до push: после хода она неверна
+                        move_san = self.board.san(move)
                         self.board.push(move)
                         self.selected_square = None
                         self.best_move = None
-                        self.update_display()
-                        self.status_var.set(f"✅ Ход {self.board.san(move)} сделан")
+                        self._refresh_legal_cache()
+
+                        # Перерисовываем только клетки этого хода
+                        self.board_canvas.delete("overlay")
+                        self._apply_move_visual(move)
+                        self.update_info_text()
+                        self.status_var.set(f"✅ Ход {move_san} сделан")
                     else:
                         self.selected_square = None
                         self.update_display()
@@ -521,44 +1042,48 @@ class ChessAnalyzerGUI:
                     self.update_display()
 
     def update_info_text(self):
-        """Обновление текстовой информации о позиции"""
-        self.info_text.config(state=tk.NORMAL)
-        self.info_text.delete(1.0, tk.END)
-
-        # Определяем статус игры
-        if self.board.is_checkmate():
+        """Обновление информации о позиции (только изменившихся строк)"""
+        # Определяем статус игры; мат и пат - по числу легальных ходов
+        # из _refresh_legal_cache, без повторной генерации ходов
+        in_check = self.board.is_check()
+        if self._legal_count == 0 and in_check:
             status = "ШАХ И МАТ!"
-        elif self.board.is_stalemate():
+        elif self._legal_count == 0:
             status = "ПАТ"
         elif self.board.is_insufficient_material():
             status = "НЕДОСТАТОК МАТЕРИАЛА"
-        elif self.board.is_check():
+        elif in_check:
             status = "ШАХ"
         else:
             status = "ИГРА ИДЁТ"
 
         # Собираем информацию
-        info = f"""╔══════════════════════════════════════╗
-║         ИНФОРМАЦИЯ О ПОЗИЦИИ         ║
-╠══════════════════════════════════════╣
-║ Статус: {status:26} ║
-║ Ход: {'белых' if self.board.turn == chess.WHITE else 'чёрных':29} ║
-║ Всего ходов: {len(self.board.move_stack):22} ║
-║ Возможных ходов: {self.board.legal_moves.count():19} ║
-╠══════════════════════════════════════╣
-║              FEN СТРОКА              ║
-╠══════════════════════════════════════╣
-{self.board.fen()}
-╚══════════════════════════════════════╝
-"""
+        info = (
+            status,
+            'белых' if self.board.turn == chess.WHITE else 'чёрных',
+            str(len(self.board.move_stack)),
+            str(self._legal_count),
+            self.current_fen(),
+        )
 
-        self.info_text.insert(1.0, info)
-        self.info_text.config(state=tk.DISABLED)
+        for var, value, shown in zip(self._info_vars, info, self._info_shown):
+            if value != shown:
+                var.set(value)
+        self._info_shown = info
 
     def update_clock(self):
-        """Обновление времени в статусной строке"""
-        current_time = datetime.now().strftime("%H:%M:%S")
-        self.clock_label.config(text=f"🕒 {current_time}")
+        """
+        Обновление времени в статусной строке
+
+        Пока окно свёрнуто или идёт анализ, надпись не трогаем, чтобы
+        не нагружать Tk лишней перерисовкой; часы догонят на следующем тике.
+        """
+        if not self.is_analyzing and self.root.state() != "iconic":
+            clock_text = "🕒 " + time.strftime("%H:%M:%S")
+            if clock_text != self._last_clock_text:
+                self.clock_label.config(text=clock_text)
+                self._last_clock_text = clock_text
+
         self.root.after(1000, self.update_clock)
 
     def on_time_scale(self, value):
@@ -578,6 +1103,8 @@ class ChessAnalyzerGUI:
         self.board = chess.Board()
         self.selected_square = None
         self.best_move = None
+        self._game_id += 1
+        self._refresh_legal_cache()
         self.update_display()
         self.clear_results()
         self.status_var.set("🆕 Новая игра начата")
@@ -588,6 +1115,7 @@ class ChessAnalyzerGUI:
             self.board.pop()
             self.selected_square = None
             self.best_move = None
+            self._refresh_legal_cache()
             self.update_display()
             self.status_var.set("↶ Ход отменён")
 
@@ -598,27 +1126,21 @@ class ChessAnalyzerGUI:
 
     def random_position(self):
         """Создать случайную позицию"""
-        import random
-
-        # Очищаем доску
+        # Случайные неповторяющиеся клетки: две для королей, остальные
+        # для 5-15 фигур, поэтому проверять занятость не нужно
+        white_king, black_king, *rest = random.sample(chess.SQUARES, random.randint(7, 17))
+
+        # Собираем расстановку целиком и ставим её на доску одним вызовом
+        pieces = {square: random.choice(self._RANDOM_PIECES) for square in rest}
+        pieces[white_king] = self._WHITE_KING
+        pieces[black_king] = self._BLACK_KING
         self.board.clear()
-
-        # Случайное количество фигур
-        pieces = ['r', 'n', 'b', 'q', 'k', 'p']
-
-        # Ставим королей
-        self.board.set_piece_at(random.choice(list(chess.SQUARES)), chess.Piece.from_symbol('K'))
-        self.board.set_piece_at(random.choice(list(chess.SQUARES)), chess.Piece.from_symbol('k'))
-
-        # Добавляем несколько случайных фигур
-        for _ in range(random.randint(5, 15)):
-            piece = random.choice(pieces)
-            square = random.choice(list(chess.SQUARES))
-            if self.board.piece_at(square) is None:
-                self.board.set_piece_at(square, chess.Piece.from_symbol(piece))
+        self.board.set_piece_map(pieces)
 
         self.selected_square = None
         self.best_move = None
+        self._game_id += 1
+        self._refresh_legal_cache()
         self.update_display()
         self.clear_results()
         self.status_var.set("🎲 Создана случайная позиция")
@@ -627,12 +1149,14 @@ class ChessAnalyzerGUI:
         """Диалог загрузки FEN"""
         fen = simpledialog.askstring("Загрузка FEN",
                                      "Введите FEN строку:",
-                                     initialvalue=self.board.fen())
+                                     initialvalue=self.current_fen())
         if fen:
             try:
                 self.board = chess.Board(fen)
                 self.selected_square = None
                 self.best_move = None
+                self._game_id += 1
+                self._refresh_legal_cache()
                 self.update_display()
                 self.clear_results()
                 self.status_var.set("✅ FEN загружен успешно")
@@ -650,7 +1174,7 @@ class ChessAnalyzerGUI:
         if filename:
             try:
                 with open(filename, 'w') as f:
-                    f.write(self.board.fen())
+                    f.write(self.current_fen())
                 self.status_var.set(f"💾 FEN сохранён в {filename}")
             except Exception as e:
                 self.show_error("Ошибка сохранения", str(e))
@@ -685,22 +1209,20 @@ class ChessAnalyzerGUI:
 
     def calculate_position_stats(self):
         """Вычисление статистики позиции"""
-        # Подсчёт материала
-        piece_values = {'P': 1, 'N': 3, 'B': 3, 'R': 5, 'Q': 9, 'K': 0}
-        material = 0
+        # Подсчёт материала по битбордам: для каждого типа фигуры
+        # ценность умножается на разницу числа белых и чёрных фигур
+        board = self.board
+        popcount = chess.popcount
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
 
-        white_pieces = 0
-        black_pieces = 0
+        material = 0
+        for mask, value in ((board.pawns, 1), (board.knights, 3), (board.bishops, 3),
+                            (board.rooks, 5), (board.queens, 9)):
+            material += value * (popcount(mask & white) - popcount(mask & black))
 
-        for square in chess.SQUARES:
-            piece = self.board.piece_at(square)
-            if piece:
-                if piece.color == chess.WHITE:
-                    material += piece_values.get(piece.symbol().upper(), 0)
-                    white_pieces += 1
-                else:
-                    material -= piece_values.get(piece.symbol().upper(), 0)
-                    black_pieces += 1
+        white_pieces = popcount(white)
+        black_pieces = popcount(black)
 
         material_text = f"{'+' if material > 0 else ''}{material}"
 
@@ -717,13 +1239,7 @@ class ChessAnalyzerGUI:
 
     def calculate_center_control(self):
         """Оценка контроля центра"""
-        center_squares = [chess.D4, chess.E4, chess.D5, chess.E5]
-        control = 0
-
-        for square in center_squares:
-            attackers_white = len(self.board.attackers(chess.WHITE, square))
-            attackers_black = len(self.board.attackers(chess.BLACK, square))
-            control += attackers_white - attackers_black
+        control = center_control(self.board)
 
         if control > 2:
             return "Сильный контроль белых"
@@ -741,6 +1257,10 @@ class ChessAnalyzerGUI:
         if self.is_analyzing:
             return
 
+        if self._engine_thread is not None:
+            self.status_var.set("⏳ Stockfish ещё загружается...")
+            return
+
         if not self.engine:
             self.show_error("Stockfish не загружен",
                             "Не удалось загрузить шахматный движок.\n"
@@ -754,209 +1274,311 @@ class ChessAnalyzerGUI:
         except:
             self.show_error("Ошибка настроек", "Проверьте настройки анализа")
             return
+        self._analysis_level = level
+
+        # Эту позицию с теми же настройками уже анализировали
+        cache_key = (chess.polyglot.zobrist_hash(self.board),
+                     round(self.analysis_time, 1), multipv, level)
+        cached = self._analysis_cache.get(cache_key)
+        if cached is not None:
+            self._analysis_cache.move_to_end(cache_key)
+            self.set_progress(100)
+            self.display_results(cached)
+            return
+        self._analysis_key = cache_key
 
         # Подготавливаем интерфейс
         self.is_analyzing = True
         self.analyze_button.config(state=tk.DISABLED)
-        self.progress_var.set(0)
+        self.set_progress(0)
         self.status_var.set(f"🔍 Анализирую позицию... ({self.analysis_time:.1f} сек)")
 
-        # Запускаем анализ в отдельном потоке
+        # Запускаем анализ в отдельном потоке на копии доски без истории
+        # ходов (саму доску во время анализа можно менять), его сообщения
+        # забирает _drain_results
+        self._latest_pv = {}
         thread = threading.Thread(target=self.run_analysis,
-                                  args=(level, multipv))
+                                  args=(self.board.copy(stack=False), level, multipv,
+                                        self._game_id))
         thread.daemon = True
         thread.start()
+        self.root.after(100, self._drain_results)
 
-    def run_analysis(self, level, multipv):
-        """Выполнение анализа в отдельном потоке"""
-        try:
-            # Настройка движка
-            self.engine.configure({"Skill Level": level})
+    def run_analysis(self, board, level, multipv, game_id):
+        """
+        Выполнение анализа в отдельном потоке
 
-            # Прогресс-бар имитация
-            for i in range(101):
-                time.sleep(self.analysis_time / 100)
-                self.root.after(0, lambda v=i: self.progress_var.set(v))
+        Не обращается к Tk: каждое сообщение движка по мере поиска
+        кладётся в очередь, в конце - отметка о завершении или ошибка.
+        """
+        try:
+            # Уровень передаём только при смене: лишний setoption между
+            # поисками не нужен. Пока идёт анализ, apply_engine_options
+            # словарь не трогает
+            if self._engine_options.get("Skill Level") != level:
+                self.engine.configure({"Skill Level": level})
+                self._engine_options["Skill Level"] = level
 
             # Выполнение анализа
-            if multipv > 1:
-                result = self.engine.analyse(
-                    self.board,
-                    chess.engine.Limit(time=self.analysis_time),
-                    multipv=multipv
-                )
-                analysis_results = result
-            else:
-                result = self.engine.analyse(
-                    self.board,
-                    chess.engine.Limit(time=self.analysis_time)
-                )
-                analysis_results = [result]
+            with self.engine.analysis(board,
+                                      chess.engine.Limit(time=self.analysis_time),
+                                      multipv=multipv, game=game_id,
+                                      info=ANALYSIS_INFO) as analysis:
+                for info in analysis:
+                    self._result_queue.put(("info", info))
 
-            # Обновляем интерфейс
-            self.root.after(0, self.display_results, analysis_results)
+            self._result_queue.put(("done", None))
 
         except Exception as e:
-            self.root.after(0, lambda: self.show_error("Ошибка анализа", str(e)))
-        finally:
-            self.is_analyzing = False
-            self.root.after(0, lambda: self.analyze_button.config(state=tk.NORMAL))
+            self._result_queue.put(("error", str(e)))
 
-    def display_results(self, results):
-        """Отображение результатов анализа"""
-        self.results_text.config(state=tk.NORMAL)
-        self.results_text.delete(1.0, tk.END)
+    def _drain_results(self):
+        """
+        Разбор сообщений потока анализа (в потоке Tk)
+
+        Прогресс берётся из времени поиска, а варианты выводятся
+        по мере углубления, не дожидаясь конца анализа.
+        """
+        refined = False
+        finished = False
+        error = None
+        search_time = None
+
+        try:
+            while True:
+                kind, payload = self._result_queue.get_nowait()
+                if kind == "info":
+                    if "time" in payload:
+                        search_time = payload["time"]
+                    if payload.get("pv") and "score" in payload:
+                        self._latest_pv[payload.get("multipv", 1)] = payload
+                        refined = True
+                elif kind == "error":
+                    error = payload
+                else:
+                    finished = True
+        except queue.Empty:
+            pass
+
+        # Прогресс - по последнему сообщению из накопившихся
+        if search_time is not None:
+            self.set_progress(search_time / self.analysis_time * 100)
+
+        results = [self._latest_pv[rank] for rank in sorted(self._latest_pv)]
+
+        # Позицию сменили во время анализа (ход отменён, новая партия...):
+        # варианты относятся к прежней позиции и не выводятся.
+        # Первый элемент ключа анализа - хэш Зобриста исходной позиции
+        stale = self._analysis_key[0] != chess.polyglot.zobrist_hash(self.board)
+
+        if error is None and not finished:
+            if refined and not stale:
+                self.display_results(results, final=False)
+            self.root.after(100, self._drain_results)
+            return
+
+        # Анализ закончен - восстанавливаем интерфейс
+        self.is_analyzing = False
+        self.analyze_button.config(state=tk.NORMAL)
+
+        # Потоки и хэш могли сменить во время анализа
+        self.apply_engine_options()
+
+        if error is not None:
+            self.show_error("Ошибка анализа", error)
+        elif results:
+            self.set_progress(100)
+            if stale:
+                self.status_var.set("⚠️ Позиция изменилась во время анализа")
+            else:
+                self.display_results(results)
+
+            # Запоминаем результат, вытесняя самый давний
+            self._analysis_cache[self._analysis_key] = results
+            if len(self._analysis_cache) > ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+        else:
+            self.show_error("Ошибка анализа", "Движок не вернул ни одного варианта")
+
+    def set_progress(self, percent):
+        """Прогресс-бар обновляется, только если сменился целый процент"""
+        percent = min(100, int(percent))
+        if percent != self._progress_shown:
+            self._progress_shown = percent
+            self.progress_var.set(percent)
+
+    def display_results(self, results, final=True):
+        """Отображение результатов анализа (final=False - промежуточных, во время поиска)"""
+        # Текст собирается кусками (текст, тег) и выводится одной вставкой
+        chunks = []
 
         best_result = results[0]
         self.best_move = best_result["pv"][0]
         best_score = best_result["score"].white()
 
         # Заголовок
-        self.results_text.insert(tk.END, "=" * 70 + "\n", "header")
-        self.results_text.insert(tk.END, "🎯 РЕЗУЛЬТАТЫ АНАЛИЗА\n", "header")
-        self.results_text.insert(tk.END, "=" * 70 + "\n\n", "header")
+        chunks.extend(_RESULTS_TITLE)
+
+        # Варианты проигрываются на одной копии доски (см. _pv_sans)
+        temp_board = self.board.copy(stack=False)
 
         # Лучший ход
-        move_san = self.board.san(self.best_move)
-        self.results_text.insert(tk.END, "ЛУЧШИЙ ХОД:\n", "header")
-        self.results_text.insert(tk.END, f"  {move_san} ({self.best_move})\n\n", "best")
+        best_san = self._pv_sans(temp_board, best_result["pv"][:1])[0]
+        chunks.append(("ЛУЧШИЙ ХОД:\n", TAG_HEADER))
+        chunks.append((f"  {best_san} ({self.best_move})\n\n", TAG_BEST))
 
         # Оценка позиции
-        self.results_text.insert(tk.END, "📊 ОЦЕНКА ПОЗИЦИИ:\n", "header")
+        chunks.append(("📊 ОЦЕНКА ПОЗИЦИИ:\n", TAG_HEADER))
 
         if best_score.is_mate():
             mate_in = best_score.mate()
             if mate_in > 0:
-                self.results_text.insert(tk.END, f"  Мат белым в {mate_in} ходов\n", "mate")
-                self.results_text.insert(tk.END, "  ⚡ РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО БЕЛЫХ!\n\n", "best")
+                chunks.append((f"  Мат белым в {mate_in} ходов\n", TAG_MATE))
+                chunks.append(("  ⚡ РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО БЕЛЫХ!\n\n", TAG_BEST))
             else:
-                self.results_text.insert(tk.END, f"  Мат чёрным в {-mate_in} ходов\n", "mate")
-                self.results_text.insert(tk.END, "  ⚡ РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ!\n\n", "best")
+                chunks.append((f"  Мат чёрным в {-mate_in} ходов\n", TAG_MATE))
+                chunks.append(("  ⚡ РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ!\n\n", TAG_BEST))
         else:
             eval_score = best_score.score() / 100.0
+            tag, comment = _EVAL_LABELS[bisect.bisect_left(_EVAL_THRESHOLDS, eval_score)]
 
-            if eval_score > 3.0:
-                tag = "best"
-                comment = "🏆 РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО БЕЛЫХ"
-            elif eval_score > 1.0:
-                tag = "best"
-                comment = "⭐ БОЛЬШОЕ ПРЕИМУЩЕСТВО БЕЛЫХ"
-            elif eval_score > 0.5:
-                tag = "good"
-                comment = "↑ ПРЕИМУЩЕСТВО БЕЛЫХ"
-            elif eval_score > 0.2:
-                tag = "good"
-                comment = "↗ НЕБОЛЬШОЕ ПРЕИМУЩЕСТВО БЕЛЫХ"
-            elif eval_score > -0.2:
-                tag = "neutral"
-                comment = "↔ РАВНАЯ ПОЗИЦИЯ"
-            elif eval_score > -0.5:
-                tag = "bad"
-                comment = "↘ НЕБОЛЬШОЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"
-            elif eval_score > -1.0:
-                tag = "bad"
-                comment = "↓ ПРЕИМУЩЕСТВО ЧЁРНЫХ"
-            elif eval_score > -3.0:
-                tag = "bad"
-                comment = "⭐ БОЛЬШОЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"
-            else:
-                tag = "bad"
-                comment = "🏆 РЕШАЮЩЕЕ ПРЕИМУЩЕСТВО ЧЁРНЫХ"
-
-            self.results_text.insert(tk.END, f"  {eval_score:+.2f} пешки\n", tag)
-            self.results_text.insert(tk.END, f"  {comment}\n\n", tag)
+            chunks.append((f"  {eval_score:+.2f} пешки\n", tag))
+            chunks.append((f"  {comment}\n\n", tag))
 
         # Все варианты
-        self.results_text.insert(tk.END, f"📋 ТОП-{len(results)} ВАРИАНТОВ:\n", "header")
-        self.results_text.insert(tk.END, "-" * 70 + "\n\n")
+        chunks.append((f"📋 ТОП-{len(results)} ВАРИАНТОВ:\n", TAG_HEADER))
+        chunks.append((_SECTION_RULE, TAG_SEP_MINOR))
+        chunks.append(("\n", None))
 
         for i, result in enumerate(results, 1):
-            move = result["pv"][0]
             score = result["score"].white()
-            move_san = self.board.san(move)
 
             # Форматирование оценки
             if score.is_mate():
                 eval_text = f"Мат в {abs(score.mate())}"
-                tag = "mate"
+                tag = TAG_MATE
             else:
                 eval_score = score.score() / 100.0
                 eval_text = f"{eval_score:+.2f}"
 
                 if i == 1:
-                    tag = "best"
-                elif eval_score > 0.3:
-                    tag = "good"
-                elif eval_score > -0.3:
-                    tag = "neutral"
+                    tag = TAG_BEST
                 else:
-                    tag = "bad"
+                    tag = _VARIANT_TAGS[bisect.bisect_left(_VARIANT_THRESHOLDS, eval_score)]
 
             # Вариант (первые 4 хода)
-            variant_moves = []
-            temp_board = self.board.copy()
-            for mv in result["pv"][:4]:
-                try:
-                    variant_moves.append(temp_board.san(mv))
-                    temp_board.push(mv)
-                except:
-                    variant_moves.append(str(mv))
+            variant_moves = self._pv_sans(temp_board, result["pv"])
+            move_san = variant_moves[0]
 
             # Вывод варианта
-            self.results_text.insert(tk.END, f"{i:2}. {move_san:8} → {eval_text:12}\n", tag)
+            chunks.append((f"{i:2}. {move_san:8} → {eval_text:12}\n", tag))
 
             if variant_moves:
                 variant_text = " → ".join(variant_moves)
-                self.results_text.insert(tk.END, f"    {variant_text}\n\n", "neutral")
+                chunks.append((f"    {variant_text}\n\n", TAG_NEUTRAL))
 
         # Статистика анализа
         depth = best_result.get('depth', 'N/A')
         nodes = best_result.get('nodes', 0)
-        nps = nodes / best_result.get('time', self.analysis_time)
+        # В первых сообщениях движка время поиска может быть нулевым
+        nps = nodes / (best_result.get('time') or self.analysis_time)
 
-        self.results_text.insert(tk.END, "📈 СТАТИСТИКА АНАЛИЗА:\n", "header")
-        self.results_text.insert(tk.END, f"  • Глубина анализа: {depth}\n", "neutral")
-        self.results_text.insert(tk.END, f"  • Узлов рассмотрено: {nodes:,}\n", "neutral")
-        self.results_text.insert(tk.END, f"  • Скорость анализа: {nps / 1000:.0f} тыс.узлов/сек\n", "neutral")
-        self.results_text.insert(tk.END, f"  • Время анализа: {self.analysis_time:.1f} сек\n", "neutral")
-        self.results_text.insert(tk.END, f"  • Уровень сложности: {self.level_var.get()}/20\n\n", "neutral")
+        chunks.append(("📈 СТАТИСТИКА АНАЛИЗА:\n", TAG_HEADER))
+        chunks.append((f"  • Глубина анализа: {depth}\n"
+                       f"  • Узлов рассмотрено: {nodes:,}\n"
+                       f"  • Скорость анализа: {nps / 1000:.0f} тыс.узлов/сек\n"
+                       f"  • Время анализа: {self.analysis_time:.1f} сек\n"
+                       f"  • Уровень сложности: {self._analysis_level}/20\n\n", TAG_NEUTRAL))
 
         # Рекомендация
-        self.results_text.insert(tk.END, "💡 РЕКОМЕНДАЦИЯ:\n", "header")
+        chunks.append(("💡 РЕКОМЕНДАЦИЯ:\n", TAG_HEADER))
 
         if best_score.is_mate() and best_score.mate() > 0:
-            recommendation = f"СРОЧНО делайте {move_san}! Этот ход ведёт к мату."
+            recommendation = f"СРОЧНО делайте {best_san}! Этот ход ведёт к мату."
         elif not best_score.is_mate() and best_score.score() > 300:
-            recommendation = f"Ход {move_san} даёт большое преимущество. Рекомендуется!"
+            recommendation = f"Ход {best_san} даёт большое преимущество. Рекомендуется!"
         elif not best_score.is_mate() and best_score.score() > 100:
-            recommendation = f"Ход {move_san} - хорошее продолжение."
+            recommendation = f"Ход {best_san} - хорошее продолжение."
         elif not best_score.is_mate() and best_score.score() > -100:
-            recommendation = f"Ход {move_san} - стандартное продолжение."
+            recommendation = f"Ход {best_san} - стандартное продолжение."
         else:
-            recommendation = f"Ход {move_san} - лучший из плохих вариантов. Будьте осторожны!"
+            recommendation = f"Ход {best_san} - лучший из плохих вариантов. Будьте осторожны!"
 
-        self.results_text.insert(tk.END, f"  {recommendation}\n\n", "neutral")
+        chunks.append((f"  {recommendation}\n\n", TAG_NEUTRAL))
+
+        self.results_text.config(state=tk.NORMAL)
+        self.results_text.delete(1.0, tk.END)
+        self._append_results(chunks)
 
         # Обновляем доску с подсветкой
         self.update_display()
 
         # Обновляем статус
-        self.status_var.set(f"✅ Анализ завершён. Найдено {len(results)} вариантов.")
+        if final:
+            self.status_var.set(f"✅ Анализ завершён. Найдено {len(results)} вариантов.")
+        else:
+            self.status_var.set(f"🔍 Анализирую позицию... глубина {depth}")
 
         # Прокручиваем в начало
         self.results_text.see(1.0)
         self.results_text.config(state=tk.DISABLED)
 
+    def _append_results(self, chunks):
+        """Вывод кусков display_results одной вставкой (и на каждом промежуточном обновлении)"""
+        args = []
+        for text, tag in chunks:
+            tag = tag or ()
+            if args and args[-1] == tag:
+                args[-2] += text
+            else:
+                args.append(text)
+                args.append(tag)
+        if args:
+            self.results_text.insert(tk.END, *args)
+
+    def _pv_sans(self, board, pv):
+        """
+        Запись первых ходов варианта pv (не больше 4) из позиции board
+
+        Ходы делаются на board и снимаются обратно, без копии доски
+        на каждый вариант. Запись каждого начала варианта кэшируется
+        до смены позиции, так что повторный вывод тех же вариантов
+        во время анализа не вызывает san() заново.
+        """
+        sans = []
+        pushed = 0
+        try:
+            for ply, move in enumerate(pv[:4]):
+                key = tuple(pv[:ply + 1])
+                san = self._san_cache.get(key)
+                if san is None:
+                    san = board.san(move)
+                    self._san_cache[key] = san
+                sans.append(san)
+                board.push(move)
+                pushed += 1
+        except Exception:
+            # Ход не подходит к позиции - оставшиеся ходы выводим как есть
+            sans.extend(str(move) for move in pv[len(sans):4])
+        finally:
+            for _ in range(pushed):
+                board.pop()
+        return sans
+
     def make_best_move(self):
         """Сделать лучший ход на доске"""
         if self.best_move:
             try:
-                self.board.push(self.best_move)
+                # Запись хода нужна до push: после него ход уже не из этой позиции
+                move = self.best_move
+                move_san = self.board.san(move)
+                self.board.push(move)
                 self.selected_square = None
                 self.best_move = None
+                self._refresh_legal_cache()
                 self.update_display()
                 self.clear_results()
-                self.status_var.set(f"✅ Ход {self.board.san(self.best_move)} сделан")
+                self.status_var.set(f"✅ Ход {move_san} сделан")
             except Exception as e:
                 self.show_error("Ошибка", f"Не удалось сделать ход: {e}")
         else:
@@ -967,25 +1589,7 @@ class ChessAnalyzerGUI:
         self.results_text.config(state=tk.NORMAL)
         self.results_text.delete(1.0, tk.END)
 
-        welcome_text = """Добро пожаловать в ШАХМАТНЫЙ АНАЛИЗАТОР!
-
-Для начала анализа:
-1. Установите параметры анализа справа
-2. Нажмите кнопку "НАЧАТЬ АНАЛИЗ"
-3. Дождитесь результатов
-
-Возможности программы:
-• Анализ любой шахматной позиции
-• Несколько вариантов продолжения
-• Оценка позиции в пешках
-• Рекомендации по лучшим ходам
-• Подсветка ходов на доске
-• Сохранение и загрузка позиций
-
-Удачи в анализе! 🏆
-"""
-
-        self.results_text.insert(1.0, welcome_text)
+        self.results_text.insert(1.0, _WELCOME_TEXT)
         self.results_text.config(state=tk.DISABLED)
         self.status_var.set("✅ Готов к анализу")
 
@@ -998,18 +1602,39 @@ class ChessAnalyzerGUI:
         )
 
         if filename:
-            try:
-                analysis_text = self.results_text.get(1.0, tk.END)
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(f"Анализ шахматной позиции\n")
-                    f.write(f"Дата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"FEN: {self.board.fen()}\n")
-                    f.write("=" * 70 + "\n\n")
-                    f.write(analysis_text)
-
-                self.status_var.set(f"💾 Анализ сохранён в {filename}")
-            except Exception as e:
-                self.show_error("Ошибка сохранения", str(e))
+            # Текст собираем в потоке Tk, а на диск пишем в отдельном потоке.
+            # Поток не фоновый: при закрытии окна запись успеет завершиться
+            content = (f"Анализ шахматной позиции\n"
+                       f"Дата: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                       f"FEN: {self.current_fen()}\n"
+                       + _HEADER_BAR + "\n"
+                       + self.results_text.get(1.0, tk.END))
+            errors = []
+            thread = threading.Thread(target=self._write_file_bg,
+                                      args=(filename, content, errors))
+            thread.start()
+            self.status_var.set("💾 Сохраняю анализ...")
+            self.root.after(100, self._poll_save, thread, filename, errors)
+
+    @staticmethod
+    def _write_file_bg(filename, content, errors):
+        """Запись файла (в отдельном потоке, без Tk); ошибка - в errors"""
+        try:
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(content)
+        except Exception as e:
+            errors.append(str(e))
+
+    def _poll_save(self, thread, filename, errors):
+        """Проверка завершения записи файла (в потоке Tk)"""
+        if thread.is_alive():
+            self.root.after(100, self._poll_save, thread, filename, errors)
+            return
+
+        if errors:
+            self.show_error("Ошибка сохранения", errors[0])
+        else:
+            self.status_var.set(f"💾 Анализ сохранён в {filename}")
 
     def show_error(self, title, message):
         """Показать сообщение об ошибке"""
@@ -1018,58 +1643,6 @@ class ChessAnalyzerGUI:
 
     def show_instructions(self):
         """Показать инструкцию по использованию"""
-        instructions = """=== ШАХМАТНЫЙ АНАЛИЗАТОР - ИНСТРУКЦИЯ ===
-
-🎯 ОСНОВНЫЕ ВОЗМОЖНОСТИ:
-
-1. АНАЛИЗ ПОЗИЦИЙ:
-   • Загрузка любой позиции (FEN или новая игра)
-   • Анализ движком Stockfish
-   • Несколько вариантов продолжения
-   • Оценка позиции в пешках или матовые варианты
-
-2. УПРАВЛЕНИЕ ДОСКОЙ:
-   • Кликните по фигуре, затем по клетке для хода
-   • Кнопки "Отменить ход" и "Новая игра"
-   • Случайные позиции для тренировки
-
-3. НАСТРОЙКИ АНАЛИЗА:
-   • Время анализа: 0.5 - 30 секунд
-   • Уровень сложности: 0 (новичок) - 20 (гроссмейстер)
-   • Количество вариантов: 1-10
-
-4. РАБОТА С ФАЙЛАМИ:
-   • Сохранение/загрузка позиций (FEN)
-   • Сохранение результатов анализа
-   • Экспорт в текстовый файл
-
-📊 КАК ЧИТАТЬ РЕЗУЛЬТАТЫ:
-
-• +1.50 = преимущество белых в 1.5 пешки
-• Мат в 3 = мат через 3 хода
-• Зелёный текст = лучшие ходы
-• Красный текст = плохие ходы
-• Стрелки на доске показывают рекомендуемые ходы
-
-💡 СОВЕТЫ:
-
-• Для тренировки используйте уровень 5-10
-• Для глубокого анализа - 20+ секунд и уровень 20
-• Сохраняйте интересные позиции для дальнейшего изучения
-• Используйте случайные позиции для разнообразия
-
-⚠️ ТРЕБОВАНИЯ:
-
-• Stockfish.exe в папке с программой
-• Python 3.6 или новее
-• Библиотеки: python-chess, tkinter
-
-📞 ПОДДЕРЖКА:
-
-Программа разработана для учебного проекта.
-Все вопросы и предложения приветствуются!
-"""
-
         # Создаём окно с инструкцией
         help_window = tk.Toplevel(self.root)
         help_window.title("📖 Инструкция по использованию")
@@ -1078,7 +1651,7 @@ class ChessAnalyzerGUI:
         text = scrolledtext.ScrolledText(help_window, wrap=tk.WORD,
                                          font=("Arial", 10), padx=10, pady=10)
         text.pack(fill=tk.BOTH, expand=True)
-        text.insert(tk.END, instructions)
+        text.insert(tk.END, _INSTRUCTIONS)
         text.config(state=tk.DISABLED)
 
         ttk.Button(help_window, text="Закрыть",
@@ -1086,85 +1659,48 @@ class ChessAnalyzerGUI:
 
     def show_about(self):
         """Показать информацию о программе"""
-        about_text = """=== ШАХМАТНЫЙ АНАЛИЗАТОР v2.0 ===
-
-🎮 ПРОГРАММА ДЛЯ АНАЛИЗА ШАХМАТНЫХ ПОЗИЦИЙ
-
-ОСНОВНЫЕ ФУНКЦИИ:
-• Анализ позиций движком Stockfish
-• Графический интерфейс с шахматной доской
-• Подробные рекомендации и варианты
-• Сохранение и загрузка позиций
-• Подсветка рекомендуемых ходов
-
-ТЕХНОЛОГИИ:
-• Python 3
-• Stockfish 16 (сильнейший шахматный движок)
-• Библиотека python-chess
-• Графический интерфейс Tkinter
-
-ВОЗМОЖНОСТИ АНАЛИЗА:
-• Оценка позиции в пешках
-• Поиск матовых комбинаций
-• Несколько вариантов продолжения
-• Статистика позиции
-• Рекомендации на русском языке
-
-ДЛЯ КОГО ЭТА ПРОГРАММА:
-• Шахматистов-любителей для анализа партий
-• Тренеров для подготовки учеников
-• Студентов для изучения алгоритмов
-• Всех, кто хочет улучшить свою игру
-
-🌟 ОСОБЕННОСТИ:
-• Простой и понятный интерфейс
-• Быстрый и глубокий анализ
-• Подробные объяснения
-• Работа без интернета
-
-АВТОР: Разработано для учебного проекта по
-компьютерному зрению и искусственному интеллекту.
-
-ВЕРСИЯ: 2.0 (Январь 2024)
-
-📧 Контакт: Для вопросов и предложений
-"""
-
-        messagebox.showinfo("О программе", about_text)
+        messagebox.showinfo("О программе", _ABOUT_TEXT)
 
     def debug_info(self):
         """Отладочная информация"""
+        level = self.level_var.get()
+        multipv = self.multipv_var.get()
+        moves_count = len(self.board.move_stack)
+
         info = f"""=== ОТЛАДОЧНАЯ ИНФОРМАЦИЯ ===
 
 Программа: Шахматный анализатор v2.0
 Python: {sys.version}
 Движок: {'Загружен' if self.engine else 'Не загружен'}
-Текущая позиция: {self.board.fen()}
+Текущая позиция: {self.current_fen()}
 Ход: {'белых' if self.board.turn == chess.WHITE else 'чёрных'}
-Количество ходов: {len(self.board.move_stack)}
+Количество ходов: {moves_count}
 
 Путь к Stockfish: {self.engine_path}
 Существует: {'Да' if os.path.exists(self.engine_path) else 'Нет'}
 
 Параметры анализа:
 • Время: {self.analysis_time} сек
-• Уровень: {self.level_var.get()}/20
-• Вариантов: {self.multipv_var.get()}
+• Уровень: {level}/20
+• Вариантов: {multipv}
 
-Память: {len(self.board.move_stack)} ходов в истории
+Память: {moves_count} ходов в истории
 """
 
-        # Для sys.version нужно импортировать sys
-        import sys
-
         messagebox.showinfo("Отладочная информация", info)
 
     def on_closing(self):
         """Обработка закрытия окна"""
         if messagebox.askyesno("Выход", "Вы уверены, что хотите выйти?"):
-            if self.engine:
+            # Движок, который ещё запускается, закроет фоновый поток
+            self._closing = True
+            engine = self.engine
+            if engine is None and self._engine_load_result is not None:
+                engine = self._engine_load_result[0]
+
+            if engine:
                 try:
-                    self.engine.quit()
+                    engine.quit()
                 except:
                     pass
             self.root.destroy()
@@ -1175,8 +1711,6 @@ Python: {sys.version}
 # ============================================
 
 if __name__ == "__main__":
-    import sys
-
     root = tk.Tk()
 
     # Устанавливаем иконку (если есть)
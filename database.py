@@ -46,6 +46,18 @@ class ChessDatabase:
         try:
             self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
             self.connection.row_factory = sqlite3.Row  # Для доступа к колонкам по имени
+            
+            # WAL: запись дописывается в журнал, чтение не ждёт записи,
+            # а при synchronous=NORMAL fsync нужен только на контрольной точке.
+            # Для базы в памяти журнал WAL недоступен
+            if self.db_path != ":memory:":
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("PRAGMA synchronous=NORMAL")
+            self.connection.execute("PRAGMA temp_store=MEMORY")
+            self.connection.execute("PRAGMA cache_size=-20000")  # ~20 МБ
+            self.connection.execute("PRAGMA mmap_size=268435456")  # 256 МБ
+            self.connection.execute("PRAGMA busy_timeout=5000")  # мс
+            
             logger.info(f"Подключено к базе данных: {self.db_path}")
         except Exception as e:
             logger.error(f"Ошибка подключения к базе данных: {e}")
@@ -187,57 +199,57 @@ class ChessDatabase:
             Dict: Данные пользователя
         """
         try:
-            cursor = self.connection.cursor()
-            
-            # Пробуем найти пользователя
-            cursor.execute(
-                "SELECT * FROM users WHERE user_id = ?",
-                (user_id,)
-            )
-            user = cursor.fetchone()
-            
-            if user:
-                # Обновляем время последней активности
+            # Поиск и обновление (или создание пользователя с настройками)
+            # в одной транзакции: один коммит на обращение
+            with self.connection:
+                cursor = self.connection.cursor()
+                
+                # Пробуем найти пользователя
                 cursor.execute(
-                    "UPDATE users SET last_active = CURRENT_TIMESTAMP WHERE user_id = ?",
+                    "SELECT * FROM users WHERE user_id = ?",
                     (user_id,)
                 )
-                self.connection.commit()
-                
-                # Конвертируем в словарь
-                return dict(user)
-            else:
-                # Создаём нового пользователя
-                cursor.execute('''
-                    INSERT INTO users 
-                    (user_id, username, first_name, last_name, language_code, created_at, last_active)
-                    VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                ''', (user_id, username, first_name, last_name, language_code))
+                user = cursor.fetchone()
                 
-                # Создаём настройки по умолчанию
-                cursor.execute('''
-                    INSERT INTO user_settings (user_id) VALUES (?)
-                ''', (user_id,))
-                
-                self.connection.commit()
-                
-                logger.info(f"Создан новый пользователь: {user_id} ({username})")
-                
-                # Возвращаем данные нового пользователя
-                return {
-                    'user_id': user_id,
-                    'username': username,
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'language_code': language_code,
-                    'created_at': datetime.now().isoformat(),
-                    'last_active': datetime.now().isoformat(),
-                    'games_played': 0,
-                    'analysis_count': 0,
-                    'total_analysis_time': 0,
-                    'is_banned': False,
-                    'ban_reason': None
-                }
+                if user:
+                    # Обновляем время последней активности
+                    cursor.execute(
+                        "UPDATE users SET last_active = CURRENT_TIMESTAMP WHERE user_id = ?",
+                        (user_id,)
+                    )
+                    
+                    # Конвертируем в словарь
+                    return dict(user)
+                else:
+                    # Создаём нового пользователя
+                    cursor.execute('''
+                        INSERT INTO users 
+                        (user_id, username, first_name, last_name, language_code, created_at, last_active)
+                        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                    ''', (user_id, username, first_name, last_name, language_code))
+                    
+                    # Создаём настройки по умолчанию
+                    cursor.execute('''
+                        INSERT INTO user_settings (user_id) VALUES (?)
+                    ''', (user_id,))
+                    
+                    logger.info(f"Создан новый пользователь: {user_id} ({username})")
+                    
+                    # Возвращаем данные нового пользователя
+                    return {
+                        'user_id': user_id,
+                        'username': username,
+                        'first_name': first_name,
+                        'last_name': last_name,
+                        'language_code': language_code,
+                        'created_at': datetime.now().isoformat(),
+                        'last_active': datetime.now().isoformat(),
+                        'games_played': 0,
+                        'analysis_count': 0,
+                        'total_analysis_time': 0,
+                        'is_banned': False,
+                        'ban_reason': None
+                    }
                 
         except Exception as e:
             logger.error(f"Ошибка получения/создания пользователя: {e}")
@@ -262,15 +274,7 @@ class ChessDatabase:
         """
         try:
             cursor = self.connection.cursor()
-            
-            cursor.execute('''
-                UPDATE users 
-                SET games_played = games_played + ?,
-                    analysis_count = analysis_count + ?,
-                    total_analysis_time = total_analysis_time + ?,
-                    last_active = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (games_played, analysis_count, analysis_time, user_id))
+            self._add_user_stats(cursor, user_id, games_played, analysis_count, analysis_time)
             
             self.connection.commit()
             return cursor.rowcount > 0
@@ -484,6 +488,24 @@ class ChessDatabase:
     
     # ===== МЕТОДЫ ДЛЯ РАБОТЫ С АНАЛИЗАМИ =====
     
+    def _add_user_stats(self, cursor: sqlite3.Cursor, user_id: int,
+                        games_played: int = 0,
+                        analysis_count: int = 0,
+                        analysis_time: float = 0) -> None:
+        """
+        Прибавление к статистике пользователя без коммита
+        
+        Используется внутри уже открытой транзакции, коммит - за вызывающим.
+        """
+        cursor.execute('''
+            UPDATE users 
+            SET games_played = games_played + ?,
+                analysis_count = analysis_count + ?,
+                total_analysis_time = total_analysis_time + ?,
+                last_active = CURRENT_TIMESTAMP
+            WHERE user_id = ?
+        ''', (games_played, analysis_count, analysis_time, user_id))
+    
     def save_analysis(self, user_id: int,
                      game_id: int = None,
                      fen: str = None,
@@ -513,30 +535,32 @@ class ChessDatabase:
             Optional[int]: ID сохранённого анализа или None при ошибке
         """
         try:
-            cursor = self.connection.cursor()
-            
-            cursor.execute('''
-                INSERT INTO analyses 
-                (user_id, game_id, fen, analysis_time, skill_level, multipv, 
-                 best_move, evaluation, depth, nodes, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (user_id, game_id, fen, analysis_time, skill_level, multipv,
-                  best_move, evaluation, depth, nodes))
-            
-            analysis_id = cursor.lastrowid
-            self.connection.commit()
-            
-            # Обновляем статистику анализа игры если game_id указан
-            if game_id:
+            # Анализ, счётчик игры и статистика пользователя -
+            # одной транзакцией с одним коммитом
+            with self.connection:
+                cursor = self.connection.cursor()
+                
                 cursor.execute('''
-                    UPDATE games 
-                    SET analysis_count = analysis_count + 1 
-                    WHERE game_id = ?
-                ''', (game_id,))
-                self.connection.commit()
-            
-            # Обновляем статистику пользователя
-            self.update_user_stats(user_id, analysis_count=1, analysis_time=analysis_time or 0)
+                    INSERT INTO analyses 
+                    (user_id, game_id, fen, analysis_time, skill_level, multipv, 
+                     best_move, evaluation, depth, nodes, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (user_id, game_id, fen, analysis_time, skill_level, multipv,
+                      best_move, evaluation, depth, nodes))
+                
+                analysis_id = cursor.lastrowid
+                
+                # Обновляем статистику анализа игры если game_id указан
+                if game_id:
+                    cursor.execute('''
+                        UPDATE games 
+                        SET analysis_count = analysis_count + 1 
+                        WHERE game_id = ?
+                    ''', (game_id,))
+                
+                # Обновляем статистику пользователя
+                self._add_user_stats(cursor, user_id, analysis_count=1,
+                                     analysis_time=analysis_time or 0)
             
             logger.info(f"Сохранён анализ {analysis_id} для пользователя {user_id}")
             return analysis_id
@@ -1109,7 +1133,8 @@ if __name__ == "__main__":
     positions = db.get_saved_positions(123456789)
     print(f"✅ Получено {len(positions)} позиций")
     
-    # Очистка тестовой базы
+    # Очистка тестовой базы (закрытие переносит журнал WAL в файл базы)
+    db.close()
     import os
     if os.path.exists("test_chess_bot.db"):
         os.remove("test_chess_bot.db")